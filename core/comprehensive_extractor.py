@@ -10,6 +10,7 @@ import xml.etree.ElementTree as ET
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 import re
+from .file_utils import BRACKET_CLEAN_TABLE
 
 
 class ComprehensiveTableauExtractor:
@@ -548,7 +549,7 @@ class ComprehensiveTableauExtractor:
                 
                 if exec_catalog and schema:
                     # Clean table name (remove brackets and schema prefix)
-                    clean_table = table_name.replace('[', '').replace(']', '')
+                    clean_table = table_name.translate(BRACKET_CLEAN_TABLE)
                     if '.' in clean_table:
                         # Remove schema prefix if present
                         parts = clean_table.split('.')
@@ -653,7 +654,7 @@ class ComprehensiveTableauExtractor:
     def _extract_field_details(self, field_name: str, field_obj, datasource_name: str) -> Dict[str, Any]:
         """Extract detailed information about a single field."""
         # Clean field name
-        clean_name = field_name.replace('[', '').replace(']', '')
+        clean_name = field_name.translate(BRACKET_CLEAN_TABLE)
         
         field_info = {
             "name": clean_name,
@@ -1238,7 +1239,7 @@ class ComprehensiveTableauExtractor:
                 for field_name, field_obj in datasource.fields.items():
                     if hasattr(field_obj, 'xml') and field_obj.xml and field_obj.xml.get('param-domain-type'):
                         param_info = {
-                            "name": field_name.replace('[', '').replace(']', ''),
+                            "name": field_name.translate(BRACKET_CLEAN_TABLE),
                             "caption": getattr(field_obj, 'caption', field_name),
                             "type": field_obj.xml.get('param-domain-type', 'Unknown'),
                             "current_value": field_obj.xml.get('value', ''),
@@ -1275,7 +1276,7 @@ class ComprehensiveTableauExtractor:
                 for field_name, field_obj in datasource.fields.items():
                     if hasattr(field_obj, 'calculation') and field_obj.calculation:
                         calc_info = {
-                            "name": field_name.replace('[', '').replace(']', ''),
+                            "name": field_name.translate(BRACKET_CLEAN_TABLE),
                             "caption": getattr(field_obj, 'caption', field_name),
                             "formula": field_obj.calculation,
                             "dependencies": self._extract_calculation_dependencies(field_obj.calculation),
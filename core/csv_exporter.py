@@ -4,9 +4,79 @@ CSV Exporter Module
 Handles export of field mapping data to CSV format
 """
 
+import io
 import os
+import re
+import logging
 import csv
-from .file_utils import create_safe_filename
+import functools
+import operator
+from collections import defaultdict
+from .file_utils import create_safe_filename, QUOTED_NAME_CLEAN_TABLE
+
+logger = logging.getLogger(__name__)
+
+
+_CHART_MAPPINGS = {
+    'bar': 'Clustered Column Chart or Bar Chart',
+    'line': 'Line Chart',
+    'scatter': 'Scatter Chart',
+    'crosstab': 'Matrix Visual',
+    'map': 'Map Visual (with geographic field mapping)',
+    'pie': 'Pie Chart or Donut Chart',
+    'area': 'Area Chart',
+    'heatmap': 'Matrix Visual with conditional formatting',
+    'treemap': 'Treemap Visual',
+    'bubble': 'Scatter Chart with size field',
+    'histogram': 'Column Chart with binning',
+    'box': 'Box and Whisker Chart',
+    'gantt': 'Gantt Chart (custom visual)',
+    'funnel': 'Funnel Chart',
+    'bullet': 'Column Chart with target line'
+}
+
+
+# Characters that force csv.writer to quote a field
+_CSV_UNSAFE = re.compile(r'[,"\r\n]')
+
+# Quotes and line breaks that would cause CSV issues in SQL references and formulas
+_SQL_CLEAN_TABLE = str.maketrans({'"': None, "'": None, '\n': ' ', '\r': ' '})
+_FORMULA_CLEAN_TABLE = str.maketrans({'\n': ' ', '\r': ' ', '"': "'"})
+
+# Bracket quoting is dropped and spaces become underscores in resolved table names
+_TABLE_NAME_CLEAN_TABLE = str.maketrans({'[': None, ']': None, ' ': '_'})
+
+
+@functools.lru_cache(maxsize=64)
+def _chart_type_recommendation(tableau_chart_type):
+    """Match a Tableau chart type against the known Power BI mappings (None if no match)."""
+    # Clean the chart type and get recommendation
+    clean_type = tableau_chart_type.lower().replace('_', '').replace('-', '')
+    for key, recommendation in _CHART_MAPPINGS.items():
+        if key in clean_type:
+            return recommendation
+    return None
+
+
+@functools.lru_cache(maxsize=64)
+def _worksheet_layout_recommendation(item_class, mark_type, has_rows, has_columns):
+    """Recommend a Power BI visual from a worksheet's class, mark type and layout."""
+    # Check if it's a table-like structure
+    if item_class == 'Table':
+        if has_rows and has_columns:
+            return 'Matrix Visual with rows and columns layout'
+        elif has_rows:
+            return 'Table Visual with row grouping'
+        else:
+            return 'Table Visual'
+    
+    # Check mark type for additional context
+    if mark_type == 'Automatic':
+        return 'Auto-chart (Power BI will suggest best visual)'
+    elif mark_type != 'Unknown':
+        return f'Custom mark type: {mark_type} - review for Power BI equivalent'
+    
+    return 'Review chart type manually for Power BI equivalent'
 
 
 class CSVExporter:
@@ -17,22 +87,47 @@ class CSVExporter:
     
     def get_actual_table_name(self, alias, datasource_info):
         """Get the actual table name from an alias."""
-        if datasource_info.get('sql_info', {}).get('all_tables'):
-            for table_alias, table_info in datasource_info['sql_info']['all_tables'].items():
-                # Check if the alias matches exactly or if it's a close match
-                if table_alias == alias or table_alias.replace(' ', '_') == alias or table_alias == alias.replace('_', ' '):
-                    return table_info['table_name'].replace('[', '').replace(']', '').replace(' ', '_')
-        return alias  # Return the alias if no mapping found
+        return self._lookup_actual(self._build_alias_index(datasource_info), alias)
     
     def get_original_alias(self, processed_alias, datasource_info):
         """Get the original Tableau alias (with spaces) from a processed alias."""
-        if datasource_info.get('sql_info', {}).get('all_tables'):
-            for table_alias, table_info in datasource_info['sql_info']['all_tables'].items():
-                # Check if the processed alias matches the table alias (with or without spaces)
-                if (table_alias == processed_alias or 
-                    table_alias.replace(' ', '_') == processed_alias or 
-                    table_alias == processed_alias.replace('_', ' ')):
-                    return table_alias  # Return the original alias with spaces
+        return self._lookup_original(self._build_alias_index(datasource_info), processed_alias)
+    
+    def _build_alias_index(self, datasource_info):
+        """Index a datasource's table aliases so alias lookups are dict gets instead of scans."""
+        # Exact and underscored aliases share one dict; space-swapped lookups use the other
+        alias_index = {}
+        spaced_index = {}
+        all_tables = datasource_info.get('sql_info', {}).get('all_tables')
+        if all_tables:
+            for position, (table_alias, table_info) in enumerate(all_tables.items()):
+                entry = (position, table_alias, table_info)
+                alias_index.setdefault(table_alias, entry)
+                alias_index.setdefault(table_alias.replace(' ', '_'), entry)
+                spaced_index.setdefault(table_alias, entry)
+        return alias_index, spaced_index
+    
+    def _match_alias(self, index, alias):
+        """Find the first table (in datasource order) whose alias matches, or None."""
+        alias_index, spaced_index = index
+        exact = alias_index.get(alias)
+        spaced = spaced_index.get(alias.replace('_', ' '))
+        if exact and spaced:
+            return exact if exact[0] <= spaced[0] else spaced
+        return exact or spaced
+    
+    def _lookup_actual(self, index, alias):
+        """Get the actual table name for an alias using a prebuilt alias index."""
+        match = self._match_alias(index, alias)
+        if match:
+            return match[2]['table_name'].translate(_TABLE_NAME_CLEAN_TABLE)
+        return alias  # Return the alias if no mapping found
+    
+    def _lookup_original(self, index, processed_alias):
+        """Get the original Tableau alias (with spaces) using a prebuilt alias index."""
+        match = self._match_alias(index, processed_alias)
+        if match:
+            return match[1]  # Return the original alias with spaces
         return processed_alias  # Return the processed alias if no mapping found
     
     def export_field_mapping_csv(self, output_dir, data_sources):
@@ -40,8 +135,7 @@ class CSVExporter:
         # Create workbook-specific folder
         if data_sources:
             workbook_name = data_sources[0].get('workbook_name', 'Unknown')
-            safe_workbook = workbook_name.replace(' ', '_').replace('/', '_')
-            safe_workbook = ''.join(c for c in safe_workbook if c.isalnum() or c in '_-')
+            safe_workbook = create_safe_filename(workbook_name)
             workbook_folder = os.path.join(output_dir, safe_workbook)
             os.makedirs(workbook_folder, exist_ok=True)
             
@@ -68,46 +162,57 @@ class CSVExporter:
         """Helper method to write field mapping CSV for a single datasource."""
         # Sort fields by table name first, then by column name
         # Put calculated fields at the end since they don't have table names
-        sorted_fields = sorted(ds['fields'], key=lambda x: (
-            x.get('is_calculated', False),  # Calculated fields last
-            x.get('table_name', ''), 
-            x.get('remote_name', '')
-        ))
-        
-        # Debug: Show calculated fields and parameters
-        calc_fields = [f for f in ds['fields'] if f.get('is_calculated', False)]
-        param_fields = [f for f in ds['fields'] if f.get('is_parameter', False)]
-        print(f"   CSV Export: Found {len(calc_fields)} calculated fields: {[f.get('name', 'Unknown') for f in calc_fields]}")
-        if param_fields:
-            print(f"   CSV Export: Found {len(param_fields)} parameters: {[f.get('name', 'Unknown') for f in param_fields]}")
+        keyed_fields = [((
+            field.get('is_calculated', False),  # Calculated fields last
+            field.get('table_name', ''), 
+            field.get('remote_name', '')
+        ), field) for field in ds['fields']]
+        keyed_fields.sort(key=operator.itemgetter(0))
+        sorted_fields = [field for _, field in keyed_fields]
+        
+        # Debug: Show calculated fields and parameters (only built when debug logging is on)
+        if logger.isEnabledFor(logging.DEBUG):
+            calc_names = [f.get('name', 'Unknown') for f in ds['fields'] if f.get('is_calculated', False)]
+            param_names = [f.get('name', 'Unknown') for f in ds['fields'] if f.get('is_parameter', False)]
+            logger.debug("CSV Export: Found %d calculated fields: %s", len(calc_names), calc_names)
+            if param_names:
+                logger.debug("CSV Export: Found %d parameters: %s", len(param_names), param_names)
         
         # Write CSV with field mapping including usage and calculated field info
-        with open(csv_file, 'w', newline='', encoding='utf-8') as csvfile:
+        # Build the CSV in memory, then encode and write it in one call
+        with io.StringIO(newline='') as csvfile:
             fieldnames = ['Original_Field_Name', 'Tableau_Field_Name', 'Data_Type', 'Table_Name', 'Table_Reference_SQL', 'Used_In_Workbook', 'Type', 'Calculation_Formula']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.writer(csvfile)
             
             # Write header
-            writer.writeheader()
+            writer.writerow(fieldnames)
             
-            # Write field mapping data in sorted order
+            # Build field mapping rows in sorted order, then write them in one call
+            rows = []
             for field in sorted_fields:
-                # Clean up field names for better readability
-                original_name = field.get('remote_name', '') or ''
-                original_name = original_name.strip() if original_name else ''
+                field_get = field.get
+                
+                # Read every field attribute once, normalizing empty values up front
+                original_name = (field_get('remote_name') or '').strip()
+                internal_name = field_get('name', '')
+                is_calculated = field_get('is_calculated', False)
+                is_parameter = field_get('is_parameter', False)
+                calculation_formula = field_get('calculation_formula') or ''
+                table_ref = (field_get('table_reference') or '').strip()
+                table_name_for_csv = field_get('table_name', 'Unknown')
+                datatype = field_get('datatype', 'Unknown')
+                used_in_workbook = field_get('used_in_workbook', False)
                 
                 # For tableau_name, prioritize alias/caption over internal name for calculated fields
-                is_calculated = field.get('is_calculated', False)
                 if is_calculated:
                     # For calculated fields, prefer caption or api_caption over the internal name
-                    tableau_name = (field.get('caption') or 
-                                  field.get('api_caption') or 
-                                  field.get('name', ''))
+                    tableau_name = (field_get('caption') or 
+                                  field_get('api_caption') or 
+                                  internal_name)
                 else:
                     # For regular fields, use the standard name
-                    tableau_name = field.get('name', '') or ''
+                    tableau_name = internal_name
                 tableau_name = tableau_name.strip() if tableau_name else ''
-                is_parameter = field.get('is_parameter', False)
-                calculation_formula = field.get('calculation_formula', '') or ''
                 
                 # For calculated fields, we might not have original_name
                 if is_calculated and not original_name:
@@ -118,41 +223,36 @@ class CSVExporter:
                     continue
                 
                 # Format table reference as 'Table.field_name as tableau_name'
-                table_ref = field.get('table_reference', '') or ''
-                table_ref = table_ref.strip() if table_ref else ''
-                
                 # Special handling for parameters
                 if is_parameter:
                     # For parameters, show parameter type and current value
-                    param_value = field.get('calculation_formula', '')
-                    if param_value:
-                        table_ref_sql = f"PARAMETER: {tableau_name} = {param_value}"
+                    if calculation_formula:
+                        table_ref_sql = f"PARAMETER: {tableau_name} = {calculation_formula}"
                     else:
                         table_ref_sql = f"PARAMETER: {tableau_name}"
                 elif is_calculated:
                     # For calculated fields, show the actual Tableau field name
-                    tableau_display_name = field.get('name', tableau_name)
+                    tableau_display_name = field_get('name', tableau_name)
                     table_ref_sql = f"CALCULATED: {tableau_display_name}"
-                elif table_ref and original_name and not is_calculated:
-                    if table_ref != tableau_name:
-                        # Field was renamed in Tableau - add quotes around tableau_name if it has spaces
-                        if ' ' in tableau_name:
-                            table_ref_sql = f"{table_ref}.{original_name} as '{tableau_name}'"
-                        else:
-                            table_ref_sql = f"{table_ref}.{original_name} as {tableau_name}"
-                    else:
-                        # Field wasn't renamed, just use original
-                        table_ref_sql = f"{table_ref}.{original_name}"
-                else:
+                elif not (table_ref and original_name):
                     # Use table_name as fallback
-                    table_name = field.get('table_name', 'Unknown') or 'Unknown'
+                    table_name = table_name_for_csv or 'Unknown'
                     table_ref_sql = f"{table_name}.{original_name}"
+                elif table_ref == tableau_name:
+                    # Field wasn't renamed, just use original
+                    table_ref_sql = f"{table_ref}.{original_name}"
+                elif ' ' in tableau_name:
+                    # Field was renamed in Tableau - add quotes around tableau_name since it has spaces
+                    table_ref_sql = f"{table_ref}.{original_name} as '{tableau_name}'"
+                else:
+                    # Field was renamed in Tableau
+                    table_ref_sql = f"{table_ref}.{original_name} as {tableau_name}"
                 
                 # Clean up any special characters that might cause CSV issues
-                table_ref_sql = table_ref_sql.replace('"', '').replace("'", '').replace('\n', ' ').replace('\r', ' ')
+                table_ref_sql = table_ref_sql.translate(_SQL_CLEAN_TABLE)
                 
                 # Mark if field is used in the workbook
-                used_status = 'Yes' if field.get('used_in_workbook', False) else 'No'
+                used_status = 'Yes' if used_in_workbook else 'No'
                 
                 # Determine field type
                 if is_parameter:
@@ -163,23 +263,27 @@ class CSVExporter:
                     field_type = 'Column'
                 
                 # Clean up calculation formula for CSV
-                clean_formula = calculation_formula.replace('\n', ' ').replace('\r', ' ').replace('"', "'") if calculation_formula else ''
+                clean_formula = calculation_formula.translate(_FORMULA_CLEAN_TABLE) if calculation_formula else ''
                 
                 # For calculated fields, use "Workbook" as table name instead of "Unknown"
-                table_name_for_csv = field.get('table_name', 'Unknown')
                 if is_calculated and (table_name_for_csv == 'Unknown' or not table_name_for_csv):
                     table_name_for_csv = 'Workbook'
                 
-                writer.writerow({
-                    'Original_Field_Name': original_name,
-                    'Tableau_Field_Name': tableau_name,
-                    'Data_Type': field.get('datatype', 'Unknown'),
-                    'Table_Name': table_name_for_csv,
-                    'Table_Reference_SQL': table_ref_sql,
-                    'Used_In_Workbook': used_status,
-                    'Type': field_type,
-                    'Calculation_Formula': clean_formula
-                })
+                rows.append((
+                    original_name,
+                    tableau_name,
+                    datatype,
+                    table_name_for_csv,
+                    table_ref_sql,
+                    used_status,
+                    field_type,
+                    clean_formula
+                ))
+            
+            writer.writerows(rows)
+            
+            with open(csv_file, 'wb') as f:
+                f.write(csvfile.getvalue().encode('utf-8'))
 
     def _write_combined_field_mapping_csv(self, csv_file, data_sources):
         """Helper method to write combined field mapping CSV for all datasources."""
@@ -193,53 +297,59 @@ class CSVExporter:
             datasource_name = ds.get('caption') or ds.get('name') or 'Unknown'
             
             # Debug: Show calculated fields and parameters for this datasource
-            calc_fields = [f for f in ds['fields'] if f.get('is_calculated', False)]
-            param_fields = [f for f in ds['fields'] if f.get('is_parameter', False)]
-            print(f"   CSV Export ({datasource_name}): Found {len(calc_fields)} calculated fields: {[f.get('name', 'Unknown') for f in calc_fields]}")
-            if param_fields:
-                print(f"   CSV Export ({datasource_name}): Found {len(param_fields)} parameters: {[f.get('name', 'Unknown') for f in param_fields]}")
+            if logger.isEnabledFor(logging.DEBUG):
+                calc_names = [f.get('name', 'Unknown') for f in ds['fields'] if f.get('is_calculated', False)]
+                param_names = [f.get('name', 'Unknown') for f in ds['fields'] if f.get('is_parameter', False)]
+                logger.debug("CSV Export (%s): Found %d calculated fields: %s", datasource_name, len(calc_names), calc_names)
+                if param_names:
+                    logger.debug("CSV Export (%s): Found %d parameters: %s", datasource_name, len(param_names), param_names)
             
-            # Add datasource name to each field
+            # Add datasource name to each field, computing its sort key alongside:
+            # datasource, then table name, then column name, with calculated
+            # fields at the end since they don't have table names
             for field in ds['fields']:
                 field_copy = field.copy()
                 field_copy['datasource_name'] = datasource_name
-                all_fields.append(field_copy)
+                all_fields.append(((
+                    datasource_name,
+                    field.get('is_calculated', False),  # Calculated fields last within each datasource
+                    field.get('table_name', ''), 
+                    field.get('remote_name', '')
+                ), field_copy))
         
         if not all_fields:
             print("   No fields to export")
             return
         
-        # Sort fields by datasource, then by table name, then by column name
-        # Put calculated fields at the end since they don't have table names
-        sorted_fields = sorted(all_fields, key=lambda x: (
-            x.get('datasource_name', ''),
-            x.get('is_calculated', False),  # Calculated fields last within each datasource
-            x.get('table_name', ''), 
-            x.get('remote_name', '')
-        ))
+        all_fields.sort(key=operator.itemgetter(0))
+        sorted_fields = [field for _, field in all_fields]
         
         # Write CSV with field mapping including usage and calculated field info
-        with open(csv_file, 'w', newline='', encoding='utf-8') as csvfile:
+        # Build the CSV in memory, then encode and write it in one call
+        with io.StringIO(newline='') as csvfile:
             fieldnames = ['Datasource', 'Original_Field_Name', 'Tableau_Field_Name', 'Data_Type', 'Table_Name', 'Table_Reference_SQL', 'Used_In_Workbook', 'Type', 'Calculation_Formula']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.writer(csvfile)
             
             # Write header
-            writer.writeheader()
+            writer.writerow(fieldnames)
             
-            # Write field information
+            # Build field rows, then write them in one call
+            rows = []
             for field in sorted_fields:
+                field_get = field.get
+                
                 # Get field information
-                original_name = (field.get('remote_name') or '').strip()
+                original_name = (field_get('remote_name') or '').strip()
                 
                 # For tableau_name, prioritize alias/caption for calculated fields
-                is_calculated = field.get('is_calculated', False)
-                is_parameter = field.get('is_parameter', False)
+                is_calculated = field_get('is_calculated', False)
+                is_parameter = field_get('is_parameter', False)
                 
                 if is_calculated:
                     # For calculated fields, use caption/alias if available, otherwise name
-                    tableau_name = field.get('caption') or field.get('api_caption') or field.get('name', '')
+                    tableau_name = field_get('caption') or field_get('api_caption') or field_get('name', '')
                 else:
-                    tableau_name = field.get('caption', field.get('name', ''))
+                    tableau_name = field_get('caption', field_get('name', ''))
                 
                 # Determine field type
                 if is_parameter:
@@ -250,485 +360,519 @@ class CSVExporter:
                     field_type = "Column"
                 
                 # Get calculation formula if it's a calculated field
-                formula = field.get('calculation_formula') or ''
+                formula = field_get('calculation_formula') or ''
                 
                 # Clean up the formula for CSV (remove newlines, extra spaces)
                 clean_formula = ' '.join(formula.split()) if formula else ''
                 
                 # Get table name and reference
-                table_name = field.get('table_name', '')
+                table_name = field_get('table_name', '')
                 if not table_name and not is_calculated and not is_parameter:
-                    table_name = field.get('table_reference', 'Unknown')
+                    table_name = field_get('table_reference', 'Unknown')
                 
                 # For parameters, show parameter info in table reference
                 if is_parameter and 'parameter_value' in field:
-                    table_ref_sql = f"PARAMETER: {tableau_name} = {field.get('parameter_value', 'No default')}"
+                    table_ref_sql = f"PARAMETER: {tableau_name} = {field_get('parameter_value', 'No default')}"
                 else:
                     table_ref_sql = f"{table_name}.{original_name}" if original_name and table_name else original_name or tableau_name
                 
                 # Determine if field is used in workbook
-                used_status = "Yes" if field.get('used_in_workbook', False) else "No"
-                
-                writer.writerow({
-                    'Datasource': field.get('datasource_name', ''),
-                    'Original_Field_Name': original_name,
-                    'Tableau_Field_Name': tableau_name,
-                    'Data_Type': field.get('datatype', 'Unknown'),
-                    'Table_Name': table_name,
-                    'Table_Reference_SQL': table_ref_sql,
-                    'Used_In_Workbook': used_status,
-                    'Type': field_type,
-                    'Calculation_Formula': clean_formula
-                })
+                used_status = "Yes" if field_get('used_in_workbook', False) else "No"
+                
+                rows.append((
+                    field_get('datasource_name', ''),
+                    original_name,
+                    tableau_name,
+                    field_get('datatype', 'Unknown'),
+                    table_name,
+                    table_ref_sql,
+                    used_status,
+                    field_type,
+                    clean_formula
+                ))
+            
+            writer.writerows(rows)
+            
+            with open(csv_file, 'wb') as f:
+                f.write(csvfile.getvalue().encode('utf-8'))
 
     def export_setup_guide_txt(self, output_dir, data_sources):
         """Export a simple text setup guide for Power BI migration."""
         # Create workbook-specific folder
         if data_sources:
             workbook_name = data_sources[0].get('workbook_name', 'Unknown')
-            safe_workbook = workbook_name.replace(' ', '_').replace('/', '_')
-            safe_workbook = ''.join(c for c in safe_workbook if c.isalnum() or c in '_-')
+            safe_workbook = create_safe_filename(workbook_name)
             workbook_folder = os.path.join(output_dir, safe_workbook)
             os.makedirs(workbook_folder, exist_ok=True)
         else:
             workbook_folder = output_dir
         
         for datasource_info in data_sources:
-            # Create filename using datasource name only (since we're in workbook folder)
-            # Use name if caption is empty, fallback to 'Unknown' if both are empty
-            datasource_name = datasource_info.get('caption') or datasource_info.get('name') or 'Unknown'
-            safe_datasource = datasource_name.replace(' ', '_').replace('/', '_')
-            safe_datasource = ''.join(c for c in safe_datasource if c.isalnum() or c in '_-')
-            txt_filename = f"{safe_datasource}_setup_guide.txt"
-            txt_path = os.path.join(workbook_folder, txt_filename)
-            
-            with open(txt_path, 'w', encoding='utf-8') as f:
-                f.write(f"POWER BI SETUP GUIDE\n")
-                f.write(f"==================\n\n")
-                f.write(f"Data Source: {datasource_info['name']}\n")
-                f.write(f"Caption: {datasource_info.get('caption', 'N/A')}\n")
-                f.write(f"Fields Available: {datasource_info.get('field_count', 0)}\n")
-                
-                # Count used fields and calculated fields
-                used_fields = sum(1 for field in datasource_info.get('fields', []) if field.get('used_in_workbook', False))
-                calculated_fields = sum(1 for field in datasource_info.get('fields', []) if field.get('is_calculated', False))
-                parameter_fields = sum(1 for field in datasource_info.get('fields', []) if field.get('is_parameter', False))
-                f.write(f"Fields Used in Workbook: {used_fields}\n")
-                f.write(f"Calculated Fields: {calculated_fields}\n")
-                f.write(f"Parameter Fields: {parameter_fields}\n")
-                
-                # Add parameters section if any exist
-                if parameter_fields > 0:
-                    f.write(f"\nPARAMETERS TO RECREATE IN POWER BI:\n")
-                    f.write(f"----------------------------------\n")
-                    for field in datasource_info.get('fields', []):
-                        if field.get('is_parameter', False):
-                            param_name = field.get('name', 'Unknown')
-                            param_value = field.get('calculation_formula', '')
-                            param_type = field.get('datatype', 'Unknown')
-                            f.write(f"  📊 {param_name}:\n")
-                            f.write(f"     Type: {param_type}\n")
-                            if param_value:
-                                f.write(f"     Default Value: {param_value}\n")
-                            f.write(f"     Usage: Create as Power BI parameter\n\n")
-                
-                # Add hyper data information if available
-                if datasource_info.get('hyper_data'):
-                    hyper_tables = len(datasource_info['hyper_data'])
-                    total_rows = sum(table_info['row_count'] for table_info in datasource_info['hyper_data'].values())
-                    f.write(f"Hyper Data Tables: {hyper_tables}\n")
-                    f.write(f"Total Data Rows: {total_rows:,}\n")
-                
-                f.write(f"\n")
-                
-                # Connection details
-                if datasource_info.get('connections'):
-                    f.write(f"CONNECTION DETAILS:\n")
-                    f.write(f"------------------\n")
-                    for i, conn in enumerate(datasource_info['connections'], 1):
-                        conn_type = conn.get('dbclass', 'N/A')
-                        f.write(f"Connection {i} ({conn_type}):\n")
-                        
-                        # BigQuery-specific formatting
-                        if conn_type == 'bigquery':
-                            # Show BigQuery-specific fields in priority order
-                            if conn.get('billing_project'):
-                                f.write(f"  Billing Project: {conn.get('billing_project')}\n")
-                            if conn.get('project'):
-                                f.write(f"  Project: {conn.get('project')}\n")
-                            if conn.get('dataset'):
-                                f.write(f"  Dataset: {conn.get('dataset')}\n")
-                            if conn.get('location'):
-                                f.write(f"  Location: {conn.get('location')}\n")
-                            if conn.get('region'):
-                                f.write(f"  Region: {conn.get('region')}\n")
-                            if conn.get('authentication'):
-                                f.write(f"  Authentication: {conn.get('authentication')}\n")
-                            if conn.get('connection_dialect'):
-                                f.write(f"  Connection Dialect: {conn.get('connection_dialect')}\n")
-                            if conn.get('username'):
-                                f.write(f"  Username: {conn.get('username')}\n")
-                            if conn.get('server_oauth'):
-                                f.write(f"  Server OAuth: {conn.get('server_oauth')}\n")
-                        else:
-                            # Standard connection properties for non-BigQuery
-                            f.write(f"  Server: {conn.get('server', 'N/A')}\n")
-                            f.write(f"  Database: {conn.get('dbname', 'N/A')}\n")
-                            f.write(f"  Username: {conn.get('username', 'N/A')}\n")
-                            f.write(f"  Port: {conn.get('port', 'N/A')}\n")
-                        
-                        # Other cloud database properties
-                        if conn.get('region') and conn.get('dbclass') != 'bigquery':
-                            f.write(f"  Region: {conn.get('region')}\n")
-                        
-                        f.write(f"\n")
-                
-                # Tables to import
-                if datasource_info.get('sql_info', {}).get('all_tables'):
-                    f.write(f"TABLES TO IMPORT:\n")
-                    f.write(f"----------------\n")
-                    for alias, table_info in sorted(datasource_info['sql_info']['all_tables'].items()):
-                        table_name = table_info['table_name']
-                        
-                        # Format BigQuery tables with billing project
-                        if conn_type == 'bigquery':
-                            # Get billing project from connection info
-                            billing_project = None
-                            dataset = None
-                            for conn in datasource_info.get('connections', []):
-                                if conn.get('dbclass') == 'bigquery':
-                                    billing_project = conn.get('billing_project') or conn.get('project')
-                                    dataset = conn.get('dataset')
-                                    break
-                            
-                            # Clean the table name and format for BigQuery
-                            clean_table = table_name.replace('[', '').replace(']', '').replace('`', '')
-                            if '.' in clean_table:
-                                table_parts = clean_table.split('.')
-                                actual_table = table_parts[-1]  # Get the last part (table name)
-                            else:
-                                actual_table = clean_table
-                            
-                            if billing_project and dataset:
-                                formatted_table = f"{billing_project}.{dataset}.{actual_table}"
-                            else:
-                                formatted_table = clean_table
-                        else:
-                            formatted_table = table_name.replace('[', '').replace(']', '').replace(' ', '_')
-                        
-                        if alias != formatted_table.split('.')[-1]:  # Compare with just the table name part
-                            f.write(f"  {formatted_table} as {alias}\n")
-                        else:
-                            f.write(f"  {formatted_table}\n")
-                    f.write(f"\n")
+            self._write_setup_guide(datasource_info, workbook_folder)
+        
+        return True
+
+    def _write_setup_guide(self, datasource_info, workbook_folder):
+        """Write the setup guide text file for a single datasource."""
+        # Create filename using datasource name only (since we're in workbook folder)
+        # Use name if caption is empty, fallback to 'Unknown' if both are empty
+        datasource_name = datasource_info.get('caption') or datasource_info.get('name') or 'Unknown'
+        safe_datasource = create_safe_filename(datasource_name)
+        txt_filename = f"{safe_datasource}_setup_guide.txt"
+        txt_path = os.path.join(workbook_folder, txt_filename)
+        
+        # Look up the SQL info once; it is consulted by several sections below
+        sql_info = datasource_info.get('sql_info') or {}
+        all_tables = sql_info.get('all_tables')
+        
+        # Resolve relationship table aliases through one index per datasource
+        alias_index = self._build_alias_index(datasource_info)
+        
+        # Collect the guide in memory; bind append once since it is called for every line
+        parts = []
+        write = parts.append
+        write(f"POWER BI SETUP GUIDE\n")
+        write(f"==================\n\n")
+        write(f"Data Source: {datasource_info['name']}\n")
+        write(f"Caption: {datasource_info.get('caption', 'N/A')}\n")
+        write(f"Fields Available: {datasource_info.get('field_count', 0)}\n")
+        
+        # Walk the fields once: count used/calculated fields and collect parameters,
+        # plus the used SQL columns, parameters and calculated fields for later sections
+        used_count = calculated_count = 0
+        all_parameters = []
+        used_fields = []
+        parameter_fields = []
+        calculated_fields = []
+        for field in datasource_info.get('fields', []):
+            field_get = field.get
+            is_used = field_get('used_in_workbook', False)
+            is_calculated = field_get('is_calculated', False)
+            is_parameter = field_get('is_parameter', False)
+            if is_calculated:
+                calculated_count += 1
+            if is_parameter:
+                all_parameters.append(field)
+            if not is_used:
+                continue
+            used_count += 1
+            
+            # SQL-ready column list (skip calculated fields)
+            if field_get('table_reference') and field_get('remote_name'):  # Must have a table reference and original field name
+                used_fields.append(field)
+            
+            if is_parameter:
+                parameter_fields.append(field)
+            elif is_calculated:  # Exclude parameters
+                calculated_fields.append(field)
+        
+        write(f"Fields Used in Workbook: {used_count}\n")
+        write(f"Calculated Fields: {calculated_count}\n")
+        write(f"Parameter Fields: {len(all_parameters)}\n")
+        
+        # Add parameters section if any exist
+        if all_parameters:
+            write(f"\nPARAMETERS TO RECREATE IN POWER BI:\n")
+            write(f"----------------------------------\n")
+            for field in all_parameters:
+                param_name = field.get('name', 'Unknown')
+                param_value = field.get('calculation_formula', '')
+                param_type = field.get('datatype', 'Unknown')
+                write(f"  📊 {param_name}:\n")
+                write(f"     Type: {param_type}\n")
+                if param_value:
+                    write(f"     Default Value: {param_value}\n")
+                write(f"     Usage: Create as Power BI parameter\n\n")
+        
+        # Add hyper data information if available
+        if datasource_info.get('hyper_data'):
+            hyper_tables = len(datasource_info['hyper_data'])
+            total_rows = sum(table_info['row_count'] for table_info in datasource_info['hyper_data'].values())
+            write(f"Hyper Data Tables: {hyper_tables}\n")
+            write(f"Total Data Rows: {total_rows:,}\n")
+        
+        write(f"\n")
+        
+        # Connection details
+        if datasource_info.get('connections'):
+            write(f"CONNECTION DETAILS:\n")
+            write(f"------------------\n")
+            for i, conn in enumerate(datasource_info['connections'], 1):
+                conn_type = conn.get('dbclass', 'N/A')
+                write(f"Connection {i} ({conn_type}):\n")
+                
+                # BigQuery-specific formatting
+                if conn_type == 'bigquery':
+                    # Show BigQuery-specific fields in priority order
+                    if conn.get('billing_project'):
+                        write(f"  Billing Project: {conn.get('billing_project')}\n")
+                    if conn.get('project'):
+                        write(f"  Project: {conn.get('project')}\n")
+                    if conn.get('dataset'):
+                        write(f"  Dataset: {conn.get('dataset')}\n")
+                    if conn.get('location'):
+                        write(f"  Location: {conn.get('location')}\n")
+                    if conn.get('region'):
+                        write(f"  Region: {conn.get('region')}\n")
+                    if conn.get('authentication'):
+                        write(f"  Authentication: {conn.get('authentication')}\n")
+                    if conn.get('connection_dialect'):
+                        write(f"  Connection Dialect: {conn.get('connection_dialect')}\n")
+                    if conn.get('username'):
+                        write(f"  Username: {conn.get('username')}\n")
+                    if conn.get('server_oauth'):
+                        write(f"  Server OAuth: {conn.get('server_oauth')}\n")
+                else:
+                    # Standard connection properties for non-BigQuery
+                    write(f"  Server: {conn.get('server', 'N/A')}\n")
+                    write(f"  Database: {conn.get('dbname', 'N/A')}\n")
+                    write(f"  Username: {conn.get('username', 'N/A')}\n")
+                    write(f"  Port: {conn.get('port', 'N/A')}\n")
                 
-                # Main table
-                if datasource_info.get('sql_info', {}).get('all_tables'):
-                    first_alias = list(datasource_info['sql_info']['all_tables'].keys())[0]
-                    main_table = datasource_info['sql_info']['all_tables'][first_alias]['table_name']
+                # Other cloud database properties
+                if conn.get('region') and conn.get('dbclass') != 'bigquery':
+                    write(f"  Region: {conn.get('region')}\n")
+                
+                write(f"\n")
+        
+        # Tables to import
+        if all_tables:
+            write(f"TABLES TO IMPORT:\n")
+            write(f"----------------\n")
+            for alias, table_info in sorted(all_tables.items()):
+                table_name = table_info['table_name']
+                
+                # Format BigQuery tables with billing project
+                if conn_type == 'bigquery':
+                    # Get billing project from connection info
+                    billing_project = None
+                    dataset = None
+                    for conn in datasource_info.get('connections', []):
+                        if conn.get('dbclass') == 'bigquery':
+                            billing_project = conn.get('billing_project') or conn.get('project')
+                            dataset = conn.get('dataset')
+                            break
                     
-                    # Format BigQuery main table with billing project
-                    if conn_type == 'bigquery':
-                        # Get billing project from connection info
-                        billing_project = None
-                        dataset = None
-                        for conn in datasource_info.get('connections', []):
-                            if conn.get('dbclass') == 'bigquery':
-                                billing_project = conn.get('billing_project') or conn.get('project')
-                                dataset = conn.get('dataset')
-                                break
-                        
-                        # Clean the table name and format for BigQuery
-                        clean_main_table = main_table.replace('[', '').replace(']', '').replace('`', '')
-                        if '.' in clean_main_table:
-                            table_parts = clean_main_table.split('.')
-                            actual_table = table_parts[-1]  # Get the last part (table name)
-                        else:
-                            actual_table = clean_main_table
-                        
-                        if billing_project and dataset:
-                            formatted_main_table = f"{billing_project}.{dataset}.{actual_table}"
-                        else:
-                            formatted_main_table = clean_main_table
+                    # Clean the table name and format for BigQuery
+                    clean_table = table_name.translate(QUOTED_NAME_CLEAN_TABLE)
+                    if '.' in clean_table:
+                        table_parts = clean_table.split('.')
+                        actual_table = table_parts[-1]  # Get the last part (table name)
                     else:
-                        formatted_main_table = main_table.replace('[', '').replace(']', '').replace(' ', '_')
+                        actual_table = clean_table
                     
-                    f.write(f"MAIN TABLE: {formatted_main_table} (aliased as {first_alias})\n\n")
+                    if billing_project and dataset:
+                        formatted_table = f"{billing_project}.{dataset}.{actual_table}"
+                    else:
+                        formatted_table = clean_table
+                else:
+                    formatted_table = table_name.translate(_TABLE_NAME_CLEAN_TABLE)
                 
-                # Hyper Data Tables section (if available)
-                if datasource_info.get('hyper_data'):
-                    f.write(f"HYPER DATA TABLES (Ready for Power BI Import):\n")
-                    f.write(f"--------------------------------------------\n")
-                    
-                    for table_key, table_info in datasource_info['hyper_data'].items():
-                        f.write(f"📊 {table_key}:\n")
-                        f.write(f"   Source: {table_info['source_file']}\n")
-                        f.write(f"   Table: {table_info['table_name']}\n")
-                        f.write(f"   Rows: {table_info['row_count']:,}\n")
-                        f.write(f"   Columns: {table_info['column_count']}\n")
-                        f.write(f"   Columns: {', '.join(str(col) for col in table_info['columns'])}\n")
-                        f.write(f"   Excel File: {table_key}.xlsx\n\n")
-                    
-                    f.write(f"💡 TIP: Import these Excel files directly into Power BI!\n")
-                    f.write(f"   No need to recreate SQL queries - you have the actual data.\n\n")
+                if alias != formatted_table.split('.')[-1]:  # Compare with just the table name part
+                    write(f"  {formatted_table} as {alias}\n")
+                else:
+                    write(f"  {formatted_table}\n")
+            write(f"\n")
+        
+        # Main table
+        if all_tables:
+            first_alias = next(iter(all_tables))
+            main_table = all_tables[first_alias]['table_name']
+            
+            # Format BigQuery main table with billing project
+            if conn_type == 'bigquery':
+                # Get billing project from connection info
+                billing_project = None
+                dataset = None
+                for conn in datasource_info.get('connections', []):
+                    if conn.get('dbclass') == 'bigquery':
+                        billing_project = conn.get('billing_project') or conn.get('project')
+                        dataset = conn.get('dataset')
+                        break
                 
-                # Join conditions with types
-                # Always initialize unique_relationships to avoid scope issues
-                unique_relationships = {}
+                # Clean the table name and format for BigQuery
+                clean_main_table = main_table.translate(QUOTED_NAME_CLEAN_TABLE)
+                if '.' in clean_main_table:
+                    table_parts = clean_main_table.split('.')
+                    actual_table = table_parts[-1]  # Get the last part (table name)
+                else:
+                    actual_table = clean_main_table
                 
-                if datasource_info.get('sql_info', {}).get('relationships') or datasource_info.get('sql_info', {}).get('join_conditions'):
-                    f.write(f"CREATE THESE RELATIONSHIPS IN POWER BI MODEL VIEW:\n")
-                    f.write(f"------------------------------------------------\n")
-                    
-                    # Process main relationships
-                    if datasource_info['sql_info'].get('relationships'):
-                        for rel in datasource_info['sql_info']['relationships']:
-                            try:
-                                join_type = rel.get('join_type', 'LEFT JOIN').upper()
-                                
-                                # Safely get conditions - handle missing or malformed data
-                                conditions = rel.get('conditions', [])
-                                if not isinstance(conditions, list):
-                                    conditions = []
-                                
-                                # Create a unique key for this relationship
-                                if conditions:
-                                    conditions_key = '|'.join(sorted([str(c) for c in conditions if c]))
-                                else:
-                                    # If no conditions, use a different key
-                                    left_table = rel.get('left_table', 'unknown')
-                                    right_table = rel.get('right_table', 'unknown')
-                                    conditions_key = f"{left_table}_{right_table}"
-                                
-                                if conditions_key and conditions_key not in unique_relationships:
-                                    unique_relationships[conditions_key] = {
-                                        'join_type': join_type,
-                                        'conditions': conditions,
-                                        'tables': rel.get('tables', []),
-                                        'left_table': rel.get('left_table', ''),
-                                        'right_table': rel.get('right_table', '')
-                                    }
-                            except Exception as e:
-                                # Skip malformed relationships
-                                print(f"Warning: Skipping malformed relationship: {e}")
-                                continue
-                    
-                    # Process additional join conditions
-                    additional_joins = datasource_info['sql_info'].get('join_conditions', [])
-                    if isinstance(additional_joins, list):
-                        for condition in additional_joins:
-                            if condition and str(condition) not in [str(cond) for rel in unique_relationships.values() for cond in rel.get('conditions', [])]:
-                                # This is a truly additional condition
-                                unique_relationships[f"additional_{condition}"] = {
-                                    'join_type': 'LEFT JOIN',
-                                    'conditions': [condition],
-                                    'tables': [],
-                                    'left_table': '',
-                                    'right_table': ''
-                                }
-                    
-                    # Display unique relationships in simple SQL-like format
-                    if unique_relationships:
-                        for i, (key, rel) in enumerate(unique_relationships.items(), 1):
-                            try:
-                                join_type = rel['join_type']
-                                
-                                # Extract table names from conditions for simple display
-                                if rel['conditions']:
-                                    # Get the first condition to show the basic relationship
-                                    first_condition = str(rel['conditions'][0])
-                                    if '=' in first_condition:
-                                        left_part, right_part = first_condition.split('=', 1)
-                                        left_table = left_part.split('.')[0].strip()
-                                        right_part = right_part.split('.')[0].strip()
-                                        
-                                        # Convert aliases to actual table names
-                                        actual_left_table = self.get_actual_table_name(left_table, datasource_info)
-                                        actual_right_table = self.get_actual_table_name(right_part, datasource_info)
-                                        
-                                        # Extract field names from the condition
-                                        left_field = left_part.split('.')[1].strip() if '.' in left_part else ''
-                                        right_field = right_part.split('.')[1].strip() if '.' in right_part else ''
-                                        
-                                        # Get original Tableau aliases (with spaces) from the table mapping
-                                        left_original_alias = self.get_original_alias(left_table, datasource_info)
-                                        right_original_alias = self.get_original_alias(right_part, datasource_info)
-                                        
-                                        # Format the relationship with AS for both tables
-                                        # Add quotes around aliases with spaces
-                                        left_alias = f'"{left_original_alias}"' if ' ' in left_original_alias else left_original_alias
-                                        right_alias = f'"{right_original_alias}"' if ' ' in right_original_alias else right_alias
-                                        f.write(f"{i}. {join_type} JOIN {actual_left_table} AS {left_alias} ON {actual_left_table}.{left_field} = {actual_right_table} AS {right_alias}.{right_field}\n")
-                                    else:
-                                        f.write(f"{i}. {join_type} relationship: {first_condition}\n")
-                                else:
-                                    # Fallback to basic table info if no conditions
-                                    left_table = rel.get('left_table', 'unknown')
-                                    right_table = rel.get('right_table', 'unknown')
-                                    if left_table and right_table:
-                                        f.write(f"{i}. {join_type} relationship between {left_table} and {right_table}\n")
-                                    else:
-                                        f.write(f"{i}. {join_type} relationship\n")
-                            except Exception as e:
-                                # Skip problematic relationships
-                                print(f"Warning: Error processing relationship {i}: {e}")
-                                continue
-                    
-                    # No fluff - just the relationships
-                if not unique_relationships:
-                    f.write(f"No relationships found\n")
-                
-                # SQL-ready column list for used fields (skip calculated fields)
-                used_fields = [field for field in datasource_info.get('fields', []) 
-                             if field.get('used_in_workbook', False) and 
-                             field.get('table_reference') and  # Must have a table reference (not calculated)
-                             field.get('remote_name')]  # Must have an original field name
-                
-                # Separate parameters and calculated fields
-                parameter_fields = [field for field in datasource_info.get('fields', []) 
-                                  if field.get('is_parameter', False) and 
-                                  field.get('used_in_workbook', False)]
-                
-                calculated_fields = [field for field in datasource_info.get('fields', []) 
-                                   if field.get('is_calculated', False) and 
-                                   not field.get('is_parameter', False) and  # Exclude parameters
-                                   field.get('used_in_workbook', False)]
-                
-                # Parameters section
-                if parameter_fields:
-                    f.write(f"\n")
-                    f.write(f"PARAMETERS:\n")
-                    f.write(f"-----------\n")
-                    
-                    # Sort parameter fields by name
-                    sorted_param_fields = sorted(parameter_fields, key=lambda x: x.get('name', ''))
-                    
-                    for field in sorted_param_fields:
-                        field_name = field.get('name', '').strip()
-                        formula = field.get('calculation_formula', '').strip()
-                        data_type = field.get('data_type', field.get('datatype', 'Unknown'))
-                        
-                        f.write(f"{field_name} (Parameter - {data_type}):\n")
-                        f.write(f"  {formula}\n")
-                        f.write(f"  {'-' * 50}\n\n")
-                
-                # Calculated fields section
-                if calculated_fields:
-                    f.write(f"\n")
-                    f.write(f"CALCULATED FIELDS:\n")
-                    f.write(f"------------------\n")
-                    
-                    # Sort calculated fields by name
-                    sorted_calc_fields = sorted(calculated_fields, key=lambda x: x.get('name', ''))
-                    
-                    for field in sorted_calc_fields:
-                        field_name = field.get('name', '').strip()
-                        formula = field.get('calculation_formula', '').strip()
-                        data_type = field.get('data_type', field.get('datatype', 'Unknown'))
-                        role = field.get('role', 'Unknown')
-                        aggregation = field.get('aggregation', 'Unknown')
-                        
-                        # Try to infer better data types and roles from the formula
-                        if data_type == 'Unknown' and formula:
-                            if 'DATEDIFF' in formula or 'DATETRUNC' in formula:
-                                data_type = 'date'
-                            elif 'SUM(' in formula or 'AVG(' in formula or 'COUNT(' in formula:
-                                data_type = 'numeric'
-                            elif 'IF' in formula or 'CASE' in formula or 'THEN' in formula:
-                                data_type = 'string'
+                if billing_project and dataset:
+                    formatted_main_table = f"{billing_project}.{dataset}.{actual_table}"
+                else:
+                    formatted_main_table = clean_main_table
+            else:
+                formatted_main_table = main_table.translate(_TABLE_NAME_CLEAN_TABLE)
+            
+            write(f"MAIN TABLE: {formatted_main_table} (aliased as {first_alias})\n\n")
+        
+        # Hyper Data Tables section (if available)
+        if datasource_info.get('hyper_data'):
+            write(f"HYPER DATA TABLES (Ready for Power BI Import):\n")
+            write(f"--------------------------------------------\n")
+            
+            for table_key, table_info in datasource_info['hyper_data'].items():
+                write(f"📊 {table_key}:\n")
+                write(f"   Source: {table_info['source_file']}\n")
+                write(f"   Table: {table_info['table_name']}\n")
+                write(f"   Rows: {table_info['row_count']:,}\n")
+                write(f"   Columns: {table_info['column_count']}\n")
+                write(f"   Columns: {', '.join(str(col) for col in table_info['columns'])}\n")
+                write(f"   Excel File: {table_key}.xlsx\n\n")
+            
+            write(f"💡 TIP: Import these Excel files directly into Power BI!\n")
+            write(f"   No need to recreate SQL queries - you have the actual data.\n\n")
+        
+        # Join conditions with types
+        # Always initialize unique_relationships to avoid scope issues
+        unique_relationships = {}
+        
+        if sql_info.get('relationships') or sql_info.get('join_conditions'):
+            write(f"CREATE THESE RELATIONSHIPS IN POWER BI MODEL VIEW:\n")
+            write(f"------------------------------------------------\n")
+            
+            # Process main relationships
+            if sql_info.get('relationships'):
+                for rel in sql_info['relationships']:
+                    try:
+                        join_type = rel.get('join_type', 'LEFT JOIN').upper()
                         
-                        if role == 'Unknown' and formula:
-                            if 'SUM(' in formula or 'AVG(' in formula or 'COUNT(' in formula:
-                                role = 'measure'
-                            elif 'IF' in formula or 'CASE' in formula or 'THEN' in formula:
-                                role = 'dimension'
+                        # Safely get conditions - handle missing or malformed data
+                        conditions = rel.get('conditions', [])
+                        if not isinstance(conditions, list):
+                            conditions = []
                         
-                        # For calculated fields, show the most meaningful information
-                        if aggregation != 'Unknown' and aggregation != 'None':
-                            f.write(f"{field_name} ({aggregation}):\n")
-                        elif data_type != 'Unknown' and role != 'Unknown':
-                            f.write(f"{field_name} ({data_type}, {role}):\n")
-                        elif data_type != 'Unknown':
-                            f.write(f"{field_name} ({data_type}):\n")
-                        elif role != 'Unknown':
-                            f.write(f"{field_name} ({role}):\n")
+                        # Create a unique key for this relationship
+                        if conditions:
+                            conditions_key = frozenset(str(c) for c in conditions if c)
                         else:
-                            f.write(f"{field_name}:\n")
-                        
-                        f.write(f"  {formula}\n")
-                        f.write(f"  {'-' * 50}\n\n")
-                
-                # Custom SQL Queries section
-                if datasource_info.get('sql_info', {}).get('custom_sql'):
-                    f.write(f"CUSTOM SQL QUERIES:\n")
-                    f.write(f"-------------------\n")
-                    for sql_query in datasource_info['sql_info']['custom_sql']:
-                        query_name = sql_query.get('name', 'Unknown Query')
-                        query_type = sql_query.get('type', 'SQL Query')
-                        sql_text = sql_query.get('sql', '').strip()
-                        connection = sql_query.get('connection', '')
+                            # If no conditions, use a different key
+                            left_table = rel.get('left_table', 'unknown')
+                            right_table = rel.get('right_table', 'unknown')
+                            conditions_key = f"{left_table}_{right_table}"
                         
-                        f.write(f"{query_name} ({query_type}):\n")
-                        if connection:
-                            f.write(f"  Connection: {connection}\n")
-                        f.write(f"  SQL:\n")
-                        # Indent each line of the SQL
-                        for line in sql_text.split('\n'):
-                            f.write(f"    {line}\n")
-                        f.write(f"  {'-' * 50}\n\n")
-                
-                if used_fields:
-                    f.write(f"\n")
-                    f.write(f"SQL COLUMNS:\n")
-                    
-                    # Group fields by table reference and sort by table name first, then field name
-                    table_groups = {}
-                    for field in used_fields:
-                        table_ref = field.get('table_reference', '').strip()
-                        
-                        if table_ref not in table_groups:
-                            table_groups[table_ref] = []
-                        table_groups[table_ref].append(field)
-                    
-                    # Sort tables and fields within each table
-                    for table_ref in sorted(table_groups.keys()):
-                        # Add table header comment
-                        f.write(f"\n-- {table_ref}:\n")
-                        
-                        # Sort fields within this table
-                        sorted_fields = sorted(table_groups[table_ref], key=lambda x: x.get('remote_name', ''))
+                        if conditions_key and conditions_key not in unique_relationships:
+                            unique_relationships[conditions_key] = {
+                                'join_type': join_type,
+                                'conditions': conditions,
+                                'tables': rel.get('tables', []),
+                                'left_table': rel.get('left_table', ''),
+                                'right_table': rel.get('right_table', '')
+                            }
+                    except Exception as e:
+                        # Skip malformed relationships
+                        print(f"Warning: Skipping malformed relationship: {e}")
+                        continue
+            
+            # Process additional join conditions
+            additional_joins = sql_info.get('join_conditions', [])
+            if isinstance(additional_joins, list):
+                # Conditions already covered by a relationship, checked in O(1) per join
+                seen_conditions = {str(cond) for rel in unique_relationships.values() for cond in rel.get('conditions', [])}
+                for condition in additional_joins:
+                    if condition and str(condition) not in seen_conditions:
+                        # This is a truly additional condition
+                        seen_conditions.add(str(condition))
+                        unique_relationships[f"additional_{condition}"] = {
+                            'join_type': 'LEFT JOIN',
+                            'conditions': [condition],
+                            'tables': [],
+                            'left_table': '',
+                            'right_table': ''
+                        }
+            
+            # Display unique relationships in simple SQL-like format
+            if unique_relationships:
+                # First pass: parse each relationship's first condition once
+                parsed_relationships = []
+                for rel in unique_relationships.values():
+                    parsed = None
+                    # Extract table names from conditions for simple display
+                    if rel['conditions']:
+                        # Get the first condition to show the basic relationship
+                        first_condition = str(rel['conditions'][0])
+                        if '=' in first_condition:
+                            left_part, right_part = first_condition.split('=', 1)
+                            left_table, _, left_field = left_part.partition('.')
+                            right_table, _, right_field = right_part.partition('.')
+                            parsed = (left_table.strip(), left_field.split('.')[0].strip(),
+                                      right_table.strip(), right_field.split('.')[0].strip())
+                    parsed_relationships.append((rel, parsed))
+                
+                # Second pass: resolve aliases through the index and format the output
+                for i, (rel, parsed) in enumerate(parsed_relationships, 1):
+                    try:
+                        join_type = rel['join_type']
                         
-                        for field in sorted_fields:
-                            original_name = field.get('remote_name', '').strip()
+                        if parsed:
+                            left_table, left_field, right_table, right_field = parsed
                             
-                            # For tableau_name, prioritize alias/caption for calculated fields
-                            is_calculated = field.get('is_calculated', False)
-                            if is_calculated:
-                                tableau_name = (field.get('caption') or 
-                                              field.get('api_caption') or 
-                                              field.get('name', '')).strip()
-                            else:
-                                tableau_name = field.get('name', '').strip()
+                            # Convert aliases to actual table names
+                            actual_left_table = self._lookup_actual(alias_index, left_table)
+                            actual_right_table = self._lookup_actual(alias_index, right_table)
+                            
+                            # Get original Tableau aliases (with spaces) from the table mapping
+                            left_original_alias = self._lookup_original(alias_index, left_table)
+                            right_original_alias = self._lookup_original(alias_index, right_table)
                             
-                            # Format as 'Table.field_name as tableau_name'
-                            # Quote table reference if it has spaces
-                            quoted_table_ref = f'"{table_ref}"' if ' ' in table_ref else table_ref
-                            if ' ' in tableau_name:
-                                f.write(f"  {quoted_table_ref}.{original_name} as '{tableau_name}',\n")
+                            # Format the relationship with AS for both tables
+                            # Add quotes around aliases with spaces
+                            left_alias = f'"{left_original_alias}"' if ' ' in left_original_alias else left_original_alias
+                            right_alias = f'"{right_original_alias}"' if ' ' in right_original_alias else right_original_alias
+                            write(f"{i}. {join_type} JOIN {actual_left_table} AS {left_alias} ON {actual_left_table}.{left_field} = {actual_right_table} AS {right_alias}.{right_field}\n")
+                        elif rel['conditions']:
+                            write(f"{i}. {join_type} relationship: {rel['conditions'][0]}\n")
+                        else:
+                            # Fallback to basic table info if no conditions
+                            left_table = rel.get('left_table', 'unknown')
+                            right_table = rel.get('right_table', 'unknown')
+                            if left_table and right_table:
+                                write(f"{i}. {join_type} relationship between {left_table} and {right_table}\n")
                             else:
-                                f.write(f"  {quoted_table_ref}.{original_name} as {tableau_name},\n")
+                                write(f"{i}. {join_type} relationship\n")
+                    except Exception as e:
+                        # Skip problematic relationships
+                        print(f"Warning: Error processing relationship {i}: {e}")
+                        continue
             
-            print(f"✅ Created setup guide: {txt_filename}")
+            # No fluff - just the relationships
+        if not unique_relationships:
+            write(f"No relationships found\n")
         
-        return True
+        # Parameters section
+        if parameter_fields:
+            write(f"\n")
+            write(f"PARAMETERS:\n")
+            write(f"-----------\n")
+            
+            # Sort parameter fields by name
+            sorted_param_fields = sorted(parameter_fields, key=lambda x: x.get('name', ''))
+            
+            for field in sorted_param_fields:
+                field_name = field.get('name', '').strip()
+                formula = field.get('calculation_formula', '').strip()
+                data_type = field.get('data_type', field.get('datatype', 'Unknown'))
+                
+                write(f"{field_name} (Parameter - {data_type}):\n")
+                write(f"  {formula}\n")
+                write(f"  {'-' * 50}\n\n")
+        
+        # Calculated fields section
+        if calculated_fields:
+            write(f"\n")
+            write(f"CALCULATED FIELDS:\n")
+            write(f"------------------\n")
+            
+            # Sort calculated fields by name
+            sorted_calc_fields = sorted(calculated_fields, key=lambda x: x.get('name', ''))
+            
+            for field in sorted_calc_fields:
+                field_name = field.get('name', '').strip()
+                formula = field.get('calculation_formula', '').strip()
+                data_type = field.get('data_type', field.get('datatype', 'Unknown'))
+                role = field.get('role', 'Unknown')
+                aggregation = field.get('aggregation', 'Unknown')
+                
+                # Try to infer better data types and roles from the formula
+                if data_type == 'Unknown' and formula:
+                    if 'DATEDIFF' in formula or 'DATETRUNC' in formula:
+                        data_type = 'date'
+                    elif 'SUM(' in formula or 'AVG(' in formula or 'COUNT(' in formula:
+                        data_type = 'numeric'
+                    elif 'IF' in formula or 'CASE' in formula or 'THEN' in formula:
+                        data_type = 'string'
+                
+                if role == 'Unknown' and formula:
+                    if 'SUM(' in formula or 'AVG(' in formula or 'COUNT(' in formula:
+                        role = 'measure'
+                    elif 'IF' in formula or 'CASE' in formula or 'THEN' in formula:
+                        role = 'dimension'
+                
+                # For calculated fields, show the most meaningful information
+                if aggregation != 'Unknown' and aggregation != 'None':
+                    write(f"{field_name} ({aggregation}):\n")
+                elif data_type != 'Unknown' and role != 'Unknown':
+                    write(f"{field_name} ({data_type}, {role}):\n")
+                elif data_type != 'Unknown':
+                    write(f"{field_name} ({data_type}):\n")
+                elif role != 'Unknown':
+                    write(f"{field_name} ({role}):\n")
+                else:
+                    write(f"{field_name}:\n")
+                
+                write(f"  {formula}\n")
+                write(f"  {'-' * 50}\n\n")
+        
+        # Custom SQL Queries section
+        if sql_info.get('custom_sql'):
+            write(f"CUSTOM SQL QUERIES:\n")
+            write(f"-------------------\n")
+            for sql_query in sql_info['custom_sql']:
+                query_name = sql_query.get('name', 'Unknown Query')
+                query_type = sql_query.get('type', 'SQL Query')
+                sql_text = sql_query.get('sql', '').strip()
+                connection = sql_query.get('connection', '')
+                
+                write(f"{query_name} ({query_type}):\n")
+                if connection:
+                    write(f"  Connection: {connection}\n")
+                write(f"  SQL:\n")
+                # Indent each line of the SQL
+                for line in sql_text.split('\n'):
+                    write(f"    {line}\n")
+                write(f"  {'-' * 50}\n\n")
+        
+        if used_fields:
+            write(f"\n")
+            write(f"SQL COLUMNS:\n")
+            
+            # Group fields by table reference and sort by table name first, then field name
+            table_groups = defaultdict(list)
+            for field in used_fields:
+                table_groups[field.get('table_reference', '').strip()].append(field)
+            
+            # Sort tables and fields within each table
+            for table_ref in sorted(table_groups):
+                # Add table header comment
+                write(f"\n-- {table_ref}:\n")
+                
+                # Quote table reference if it has spaces (same for every field in the table)
+                quoted_table_ref = f'"{table_ref}"' if ' ' in table_ref else table_ref
+                
+                # Sort fields within this table
+                sorted_fields = sorted(table_groups[table_ref], key=lambda x: x.get('remote_name', ''))
+                
+                for field in sorted_fields:
+                    original_name = field.get('remote_name', '').strip()
+                    
+                    # For tableau_name, prioritize alias/caption for calculated fields
+                    is_calculated = field.get('is_calculated', False)
+                    if is_calculated:
+                        tableau_name = (field.get('caption') or 
+                                      field.get('api_caption') or 
+                                      field.get('name', '')).strip()
+                    else:
+                        tableau_name = field.get('name', '').strip()
+                    
+                    # Format as 'Table.field_name as tableau_name'
+                    if ' ' in tableau_name:
+                        write(f"  {quoted_table_ref}.{original_name} as '{tableau_name}',\n")
+                    else:
+                        write(f"  {quoted_table_ref}.{original_name} as {tableau_name},\n")
+        
+        # Emit the whole guide with a single write
+        with open(txt_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(parts))
+        
+        print(f"✅ Created setup guide: {txt_filename}")
 
     def export_dashboard_usage_csv(self, output_dir, data_sources, dashboard_info):
         """Export dashboard and worksheet usage information to CSV - combined for all datasources."""
         # Create workbook-specific folder
         if data_sources:
             workbook_name = data_sources[0].get('workbook_name', 'Unknown')
-            safe_workbook = workbook_name.replace(' ', '_').replace('/', '_')
-            safe_workbook = ''.join(c for c in safe_workbook if c.isalnum() or c in '_-')
+            safe_workbook = create_safe_filename(workbook_name)
             workbook_folder = os.path.join(output_dir, safe_workbook)
             os.makedirs(workbook_folder, exist_ok=True)
         else:
@@ -746,20 +890,33 @@ class CSVExporter:
         # Write CSV with dashboard and worksheet information
         with open(csv_file, 'w', newline='', encoding='utf-8') as csvfile:
             fieldnames = ['Item_Name', 'Item_Type', 'Chart_Type', 'Mark_Type', 'Size', 'Used_Fields', 'Filters', 'Filter_Function', 'Filter_Operation', 'Filter_Values', 'Filter_Description', 'Slicers', 'Rows_Layout', 'Columns_Layout', 'Cards_Layout', 'Aggregation', 'Power_BI_Recommendations']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.writer(csvfile)
             
             # Write header
-            writer.writeheader()
+            writer.writerow(fieldnames)
+            
+            get_rec = self.get_powerbi_chart_recommendation
+            write = csvfile.write
             
             # Write dashboard and worksheet data
             for item_name, item_info in dashboard_info.items():
-                item_type = item_info.get('type', 'Unknown')
+                item_get = item_info.get
+                item_type = item_get('type', 'Unknown')
                 
                 if item_type == 'worksheet':
-                    chart_type = item_info.get('class', 'Unknown')
-                    mark_type = item_info.get('mark_type', 'Unknown')
+                    # Read every worksheet key once up front
+                    chart_type = item_get('class', 'Unknown')
+                    mark_type = item_get('mark_type', 'Unknown')
+                    used_fields_src = item_get('used_fields', ())
+                    filters_src = item_get('filters', ())
+                    slicers_src = item_get('slicers', ())
+                    rows_src = item_get('rows_layout', ())
+                    columns_src = item_get('columns_layout', ())
+                    cards_src = item_get('cards_layout', {})
+                    aggregation_enabled = item_get('aggregation_enabled', False)
+                    
                     size = 'N/A'
-                    used_fields = '; '.join(item_info.get('used_fields', []))
+                    used_fields = '; '.join(used_fields_src)
                     
                     # Format filters with type and field info
                     filters = []
@@ -768,7 +925,7 @@ class CSVExporter:
                     filter_values = []
                     filter_descriptions = []
                     
-                    for f in item_info.get('filters', []):
+                    for f in filters_src:
                         filter_desc = f"{f['field']}({f['type']})"
                         if f['name'] and f['name'] != f['field']:
                             filter_desc = f"{f['name']}: {filter_desc}"
@@ -794,23 +951,23 @@ class CSVExporter:
                     filter_descriptions_str = '; '.join(filter_descriptions)
                     
                     # Format slicers
-                    slicers = '; '.join(item_info.get('slicers', []))
+                    slicers = '; '.join(slicers_src)
                     
                     # Format layout information
-                    rows_layout = '; '.join(item_info.get('rows_layout', []))
-                    columns_layout = '; '.join(item_info.get('columns_layout', []))
+                    rows_layout = '; '.join(rows_src)
+                    columns_layout = '; '.join(columns_src)
                     
                     # Format cards layout (UI structure)
                     cards_layout = []
-                    for edge, cards in item_info.get('cards_layout', {}).items():
+                    for edge, cards in cards_src.items():
                         cards_layout.append(f"{edge}: {', '.join(cards)}")
                     cards_layout_str = '; '.join(cards_layout)
                     
                     # Aggregation setting
-                    aggregation = 'Yes' if item_info.get('aggregation_enabled', False) else 'No'
+                    aggregation = 'Yes' if aggregation_enabled else 'No'
                     
                     # Power BI recommendations based on chart type and layout
-                    powerbi_recommendations = self.get_powerbi_chart_recommendation(chart_type, item_info)
+                    powerbi_recommendations = get_rec(chart_type, item_info)
                     
                 elif item_type == 'dashboard':
                     chart_type = 'Dashboard'
@@ -848,69 +1005,47 @@ class CSVExporter:
                     aggregation = 'N/A'
                     powerbi_recommendations = 'Review manually'
                 
-                writer.writerow({
-                    'Item_Name': item_name,
-                    'Item_Type': item_type,
-                    'Chart_Type': chart_type,
-                    'Mark_Type': mark_type,
-                    'Size': size,
-                    'Used_Fields': used_fields,
-                    'Filters': filters_str if item_type == 'worksheet' else filters,
-                    'Filter_Function': filter_functions_str,
-                    'Filter_Operation': filter_operations_str,
-                    'Filter_Values': filter_values_str,
-                    'Filter_Description': filter_descriptions_str,
-                    'Slicers': slicers,
-                    'Rows_Layout': rows_layout,
-                    'Columns_Layout': columns_layout,
-                    'Cards_Layout': cards_layout_str,
-                    'Aggregation': aggregation,
-                    'Power_BI_Recommendations': powerbi_recommendations
-                })
+                row = [
+                    item_name,
+                    item_type,
+                    chart_type,
+                    mark_type,
+                    size,
+                    used_fields,
+                    filters_str if item_type == 'worksheet' else filters,
+                    filter_functions_str,
+                    filter_operations_str,
+                    filter_values_str,
+                    filter_descriptions_str,
+                    slicers,
+                    rows_layout,
+                    columns_layout,
+                    cards_layout_str,
+                    aggregation,
+                    powerbi_recommendations
+                ]
+                
+                # Plain string rows need no quoting, so skip the csv writer for them
+                if all(type(value) is str and not _CSV_UNSAFE.search(value) for value in row):
+                    write(','.join(row))
+                    write('\r\n')
+                else:
+                    writer.writerow(row)
 
     def get_powerbi_chart_recommendation(self, tableau_chart_type, item_info=None):
         """Get Power BI chart recommendations based on Tableau chart type and layout."""
-        chart_mappings = {
-            'bar': 'Clustered Column Chart or Bar Chart',
-            'line': 'Line Chart',
-            'scatter': 'Scatter Chart',
-            'crosstab': 'Matrix Visual',
-            'map': 'Map Visual (with geographic field mapping)',
-            'pie': 'Pie Chart or Donut Chart',
-            'area': 'Area Chart',
-            'heatmap': 'Matrix Visual with conditional formatting',
-            'treemap': 'Treemap Visual',
-            'bubble': 'Scatter Chart with size field',
-            'histogram': 'Column Chart with binning',
-            'box': 'Box and Whisker Chart',
-            'gantt': 'Gantt Chart (custom visual)',
-            'funnel': 'Funnel Chart',
-            'bullet': 'Column Chart with target line'
-        }
-        
-        # Clean the chart type and get recommendation
-        clean_type = tableau_chart_type.lower().replace('_', '').replace('-', '')
-        for key, recommendation in chart_mappings.items():
-            if key in clean_type:
-                return recommendation
+        recommendation = _chart_type_recommendation(tableau_chart_type)
+        if recommendation:
+            return recommendation
         
         # If we have additional layout information, provide more specific recommendations
         if item_info and item_info.get('type') == 'worksheet':
-            # Check if it's a table-like structure
-            if item_info.get('class') == 'Table':
-                if item_info.get('rows_layout') and item_info.get('columns_layout'):
-                    return 'Matrix Visual with rows and columns layout'
-                elif item_info.get('rows_layout'):
-                    return 'Table Visual with row grouping'
-                else:
-                    return 'Table Visual'
-            
-            # Check mark type for additional context
-            mark_type = item_info.get('mark_type', '')
-            if mark_type == 'Automatic':
-                return 'Auto-chart (Power BI will suggest best visual)'
-            elif mark_type != 'Unknown':
-                return f'Custom mark type: {mark_type} - review for Power BI equivalent'
+            return _worksheet_layout_recommendation(
+                item_info.get('class'),
+                item_info.get('mark_type', ''),
+                bool(item_info.get('rows_layout')),
+                bool(item_info.get('columns_layout'))
+            )
         
         return 'Review chart type manually for Power BI equivalent'
 
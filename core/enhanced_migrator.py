@@ -5,17 +5,184 @@ Integrates comprehensive data extraction with existing functionality
 """
 
 import os
+import re
 import json
+import logging
+import functools
 from datetime import datetime
+from operator import itemgetter
+from itertools import chain, repeat
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Any
-from .tableau_parser import TableauParser
-from .comprehensive_extractor import ComprehensiveTableauExtractor
-from .field_definitions_extractor import FieldDefinitionsExtractor
-from .field_extractor import FieldExtractor
-from .sql_generator import SQLGenerator
-from .csv_exporter import CSVExporter
-from .thumbnail_extractor import ThumbnailExtractor
-from .file_utils import ensure_directory_exists
+
+logger = logging.getLogger(__name__)
+
+
+# Spaces and special characters, and runs of underscores, in output file names
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w\-_]')
+_REPEATED_UNDERSCORES = re.compile(r'_+')
+
+# Write buffer for JSON output, so multi-MB files reach the OS in a few large writes
+_JSON_WRITE_BUFFER = 4 << 20
+
+# Tableau chart type -> Power BI visual type
+_POWERBI_VISUAL_MAP = {
+    'Bar Chart': 'Clustered Bar Chart',
+    'Line Chart': 'Line Chart',
+    'Scatter Plot': 'Scatter Chart',
+    'Table': 'Table',
+    'Map': 'Map',
+    'Pie Chart': 'Pie Chart',
+    'Heatmap': 'Matrix',
+    'Treemap': 'Treemap'
+}
+
+# Chart types that can rate a visual as Easy or Medium to migrate
+_EASY_VISUAL_CHART_TYPES = frozenset(('Table', 'Bar Chart'))
+_MEDIUM_VISUAL_CHART_TYPES = frozenset(('Line Chart', 'Scatter Plot'))
+
+# (type, name) of a dashboard's contained object
+_OBJECT_TYPE_AND_NAME = itemgetter('type', 'name')
+
+
+# Detailed migration steps; {placeholders} are filled in per workbook
+_MIGRATION_STEP_TEMPLATES = (
+    {
+        "step": 1,
+        "title": "Data Source Setup",
+        "description": "Set up data sources in Power BI",
+        "estimated_time": "1-2 hours",
+        "details": (
+            "Connect to data sources using Power Query",
+            "Configure authentication and connection strings",
+            "Test data connections"
+        )
+    },
+    {
+        "step": 2,
+        "title": "Data Model Creation",
+        "description": "Create data model and relationships",
+        "estimated_time": "2-4 hours",
+        "details": (
+            "Import data tables",
+            "Create relationships between tables",
+            "Set up data types and formatting"
+        )
+    },
+    {
+        "step": 3,
+        "title": "Calculated Fields Migration",
+        "description": "Migrate {calculation_count} calculated fields",
+        "estimated_time": "{calculation_hours:.1f} hours",
+        "details": (
+            "Convert Tableau formulas to DAX",
+            "Create measures and calculated columns",
+            "Test calculation results"
+        )
+    },
+    {
+        "step": 4,
+        "title": "Visual Creation",
+        "description": "Create {worksheet_count} visuals",
+        "estimated_time": "{worksheet_hours:.1f} hours",
+        "details": (
+            "Create visuals matching Tableau worksheets",
+            "Configure field placements and formatting",
+            "Set up filters and interactions"
+        )
+    },
+    {
+        "step": 5,
+        "title": "Dashboard Creation",
+        "description": "Create {dashboard_count} dashboard pages",
+        "estimated_time": "{dashboard_count:.1f} hours",
+        "details": (
+            "Create report pages",
+            "Arrange visuals and configure layout",
+            "Set up page-level filters"
+        )
+    },
+    {
+        "step": 6,
+        "title": "Testing and Validation",
+        "description": "Test and validate migration results",
+        "estimated_time": "2-4 hours",
+        "details": (
+            "Compare results with original Tableau workbook",
+            "Test all interactions and filters",
+            "Validate data accuracy"
+        )
+    }
+)
+
+# Recommendations that apply to every migration, after the workbook-specific ones
+_GENERAL_RECOMMENDATIONS = (
+    "Set up proper data refresh schedules in Power BI",
+    "Configure row-level security if needed",
+    "Plan for user training on Power BI interface",
+    "Consider using Power BI Premium for better performance"
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _safe_filename(filename):
+    """Sanitize a workbook name for use in output folder and file names."""
+    # Replace spaces and special characters with underscores
+    safe_name = _UNSAFE_FILENAME_CHARS.sub('_', filename)
+    # Remove multiple consecutive underscores
+    safe_name = _REPEATED_UNDERSCORES.sub('_', safe_name)
+    # Remove leading/trailing underscores
+    return safe_name.strip('_')
+
+
+@functools.lru_cache(maxsize=128)
+def _estimate_migration_time(complexity: str, worksheet_count: int, calculation_count: int) -> str:
+    """Estimate migration time from workbook complexity, worksheet and calculation counts."""
+    if complexity == "High":
+        base_hours = 8
+    elif complexity == "Medium":
+        base_hours = 4
+    else:
+        base_hours = 2
+    
+    # Add time for worksheets and calculations
+    worksheet_hours = worksheet_count * 0.5
+    calculation_hours = calculation_count * 0.25
+    
+    total_hours = base_hours + worksheet_hours + calculation_hours
+    
+    if total_hours < 4:
+        return f"{total_hours:.1f} hours"
+    elif total_hours < 8:
+        return f"{total_hours:.1f} hours (1 day)"
+    else:
+        days = total_hours / 8
+        return f"{total_hours:.1f} hours ({days:.1f} days)"
+
+
+def _detailed_migration_steps(calculation_count: int, worksheet_count: int, dashboard_count: int) -> List[Dict[str, Any]]:
+    """Build the detailed migration steps for the given calculation, worksheet and dashboard counts."""
+    values = {
+        'calculation_count': calculation_count,
+        'calculation_hours': calculation_count * 0.25,
+        'worksheet_count': worksheet_count,
+        'worksheet_hours': worksheet_count * 0.5,
+        'dashboard_count': dashboard_count
+    }
+    
+    # Only description and estimated_time depend on the workbook; every report gets fresh dicts
+    steps = [
+        {
+            **template,
+            "description": template["description"].format(**values),
+            "estimated_time": template["estimated_time"].format(**values),
+            "details": list(template["details"])
+        }
+        for template in _MIGRATION_STEP_TEMPLATES
+    ]
+    
+    return steps
 
 
 class EnhancedTableauMigrator:
@@ -27,8 +194,60 @@ class EnhancedTableauMigrator:
         self.field_definitions_extractor = None
         self.field_extractor = None
         self.sql_generator = None
-        self.csv_exporter = CSVExporter()
-        self.thumbnail_extractor = ThumbnailExtractor()
+        
+        # Output folder for the file currently being processed
+        self._output_tableau_path = None
+        self._safe_workbook = None
+        self._output_dir = None
+    
+    # Extractor and exporter modules are imported on first use, so building a
+    # report from already-extracted data doesn't load the parsing stack
+    @functools.cached_property
+    def csv_exporter(self):
+        """CSV exporter used for the legacy export formats."""
+        from .csv_exporter import CSVExporter
+        return CSVExporter()
+    
+    @functools.cached_property
+    def thumbnail_extractor(self):
+        """Thumbnail extractor for dashboard/worksheet screenshots."""
+        from .thumbnail_extractor import ThumbnailExtractor
+        return ThumbnailExtractor()
+    
+    @classmethod
+    def process_many(cls, tableau_paths: List[str], output_format: str = "all") -> List[Dict]:
+        """
+        Process several Tableau files in parallel, one worker process per CPU.
+        
+        Each file is handled by a fresh migrator in its own process, so parsing and
+        export run on separate cores. Files whose names sanitize to the same output
+        folder are processed one after another in a single worker, so they never
+        write the same files concurrently. Callers on Windows must invoke this from
+        under an ``if __name__ == '__main__':`` guard.
+        
+        Returns:
+            List of comprehensive data dictionaries (None for failed files), in input order
+        """
+        tableau_paths = list(tableau_paths)
+        if len(tableau_paths) <= 1:
+            return [cls().process_tableau_file_comprehensive(path, output_format) for path in tableau_paths]
+        
+        path_groups = _group_by_output_folder(tableau_paths)
+        
+        results = [None] * len(tableau_paths)
+        max_workers = min(os.cpu_count() or 1, len(path_groups))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            group_results = executor.map(
+                _process_files_comprehensive,
+                repeat(cls),
+                ([tableau_paths[index] for index in group] for group in path_groups),
+                repeat(output_format),
+                chunksize=1
+            )
+            for group, group_result in zip(path_groups, group_results):
+                for index, result in zip(group, group_result):
+                    results[index] = result
+        return results
     
     def process_tableau_file_comprehensive(self, tableau_path: str, output_format: str = "all") -> Dict:
         """
@@ -41,18 +260,22 @@ class EnhancedTableauMigrator:
         Returns:
             Dictionary containing all extracted data
         """
-        print(f"🔄 Processing with comprehensive extraction: {tableau_path}")
-        print("-" * 70)
+        from .tableau_parser import TableauParser
+        from .comprehensive_extractor import ComprehensiveTableauExtractor
+        from .field_definitions_extractor import FieldDefinitionsExtractor
+        
+        logger.info("🔄 Processing with comprehensive extraction: %s", tableau_path)
+        logger.info("-" * 70)
         
         try:
             # 1. Parse Tableau file
             self.parser = TableauParser(tableau_path)
             if not self.parser.extract_and_parse():
-                print(f"❌ Failed to parse {tableau_path}")
+                logger.error("❌ Failed to parse %s", tableau_path)
                 return None
             
             file_type = "TWBX" if tableau_path.endswith('.twbx') else "TWB"
-            print(f"✅ {file_type} parsed successfully using official Tableau API + XML")
+            logger.info("✅ %s parsed successfully using official Tableau API + XML", file_type)
             
             # 2. Initialize comprehensive extractor
             self.comprehensive_extractor = ComprehensiveTableauExtractor(
@@ -65,18 +288,18 @@ class EnhancedTableauMigrator:
             self.field_definitions_extractor = FieldDefinitionsExtractor()
             
             # 4. Extract comprehensive data
-            print("🔍 Extracting comprehensive data...")
+            logger.info("🔍 Extracting comprehensive data...")
             comprehensive_data = self.comprehensive_extractor.extract_all_data()
             
             # 5. Extract universal field definitions
-            print("🔍 Extracting universal field definitions...")
+            logger.info("🔍 Extracting universal field definitions...")
             field_definitions = self.field_definitions_extractor.extract_all_field_definitions(
                 self.parser.get_workbook(),
                 self.parser.get_xml_root()
             )
             
             # 6. Extract thumbnails
-            print("🖼️ Extracting thumbnails...")
+            logger.info("🖼️ Extracting thumbnails...")
             self._extract_thumbnails(tableau_path)
             
             # 7. Export based on requested format
@@ -85,71 +308,91 @@ class EnhancedTableauMigrator:
             
 
             
-            print("✅ Comprehensive processing complete!")
+            logger.info("✅ Comprehensive processing complete!")
             return comprehensive_data
             
         except Exception as e:
-            print(f"❌ Error in comprehensive processing: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error in comprehensive processing: %s", e)
             return None
+        
+        finally:
+            # Don't carry the output folder over to the next file
+            self._output_tableau_path = None
+            self._safe_workbook = None
+            self._output_dir = None
+    
+    def _get_output_dir(self, tableau_path: str) -> tuple:
+        """Get (safe_workbook, output_dir) for a Tableau file, creating the folder only once per file."""
+        if self._output_tableau_path != tableau_path:
+            workbook_name = os.path.splitext(os.path.basename(tableau_path))[0]
+            self._safe_workbook = self._create_safe_filename(workbook_name)
+            self._output_dir = os.path.join('output', self._safe_workbook)
+            os.makedirs(self._output_dir, exist_ok=True)
+            self._output_tableau_path = tableau_path
+        return self._safe_workbook, self._output_dir
     
     def _export_comprehensive_json(self, data: Dict, tableau_path: str, field_definitions: Dict = None) -> None:
         """Export comprehensive data to a single consolidated JSON file."""
-        # Create output directory
-        workbook_name = os.path.splitext(os.path.basename(tableau_path))[0]
-        safe_workbook = self._create_safe_filename(workbook_name)
-        output_dir = os.path.join('output', safe_workbook)
-        ensure_directory_exists(output_dir)
+        # Create output directory (resolved once per Tableau file)
+        safe_workbook, output_dir = self._get_output_dir(tableau_path)
         
-        # Create consolidated data structure
-        consolidated_data = {
-            "workbook_info": {
+        # Sections of the consolidated file, in output order
+        workbook_metadata = data.get("workbook_metadata", {})
+        sections = (
+            ("workbook_info", {
                 "name": safe_workbook,
                 "original_filename": os.path.basename(tableau_path),
                 "extraction_timestamp": data.get("extraction_timestamp", ""),
-                "total_datasources": data.get("workbook_metadata", {}).get("total_datasources", 0),
-                "total_worksheets": data.get("workbook_metadata", {}).get("total_worksheets", 0),
-                "total_dashboards": data.get("workbook_metadata", {}).get("total_dashboards", 0),
-                "complexity_score": data.get("workbook_metadata", {}).get("complexity_score", "Unknown")
-            },
-            "workbook_metadata": data.get("workbook_metadata", {}),
-            "datasources": data.get("datasources", []),
-            "fields_comprehensive": data.get("fields_comprehensive", {}),
-            "worksheets": data.get("worksheets", []),
-            "dashboards": data.get("dashboards", []),
-            "parameters": data.get("parameters", []),
-            "calculated_fields": data.get("calculated_fields", []),
-            "powerbi_migration_guide": data.get("powerbi_migration_guide", {}),
-            "field_definitions_universal": field_definitions or {}
-        }
-        
-        # Export single comprehensive file
+                "total_datasources": workbook_metadata.get("total_datasources", 0),
+                "total_worksheets": workbook_metadata.get("total_worksheets", 0),
+                "total_dashboards": workbook_metadata.get("total_dashboards", 0),
+                "complexity_score": workbook_metadata.get("complexity_score", "Unknown")
+            }),
+            ("workbook_metadata", workbook_metadata),
+            ("datasources", data.get("datasources", [])),
+            ("fields_comprehensive", data.get("fields_comprehensive", {})),
+            ("worksheets", data.get("worksheets", [])),
+            ("dashboards", data.get("dashboards", [])),
+            ("parameters", data.get("parameters", [])),
+            ("calculated_fields", data.get("calculated_fields", [])),
+            ("powerbi_migration_guide", data.get("powerbi_migration_guide", {})),
+            ("field_definitions_universal", field_definitions or {})
+        )
+        
+        # Export single comprehensive file, streaming one section at a time instead of
+        # building a consolidated dict; nested lines are shifted one indent level
         comprehensive_path = os.path.join(output_dir, f"{safe_workbook}_complete.json")
-        with open(comprehensive_path, 'w', encoding='utf-8') as f:
-            json.dump(consolidated_data, f, indent=2, ensure_ascii=False)
-        print(f"✅ Complete data exported to: {os.path.basename(comprehensive_path)}")
+        with open(comprehensive_path, 'w', encoding='utf-8', buffering=_JSON_WRITE_BUFFER) as f:
+            f.write('{')
+            for index, (key, value) in enumerate(sections):
+                encoded = json.dumps(value, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+                f.write(f'{"," if index else ""}\n  {json.dumps(key)}: {encoded}')
+            f.write('\n}')
+        logger.info("✅ Complete data exported to: %s", os.path.basename(comprehensive_path))
     
     def _extract_thumbnails(self, tableau_path: str) -> None:
         """Extract thumbnail screenshots from the Tableau file."""
+        # Create output directory (resolved once per Tableau file)
+        _, output_dir = self._get_output_dir(tableau_path)
+        self._save_thumbnails(output_dir)
+    
+    def _save_thumbnails(self, output_dir: str) -> None:
+        """Save thumbnails from the parsed workbook into the output folder."""
+        if not self.parser or self.parser.get_xml_root() is None:
+            return
+        
         try:
-            from core.thumbnail_extractor import ThumbnailExtractor
-            
-            # Create output directory
-            workbook_name = os.path.splitext(os.path.basename(tableau_path))[0]
-            safe_workbook = self._create_safe_filename(workbook_name)
-            output_dir = os.path.join('output', safe_workbook)
-            ensure_directory_exists(output_dir)
-            
             # Extract thumbnails using the XML root from the parser
-            thumbnail_extractor = ThumbnailExtractor()
-            xml_root = self.parser.get_xml_root()
+            results = self.thumbnail_extractor.extract_thumbnails(self.parser.get_xml_root(), output_dir)
             
-            thumbnails = thumbnail_extractor.extract_thumbnails(xml_root, output_dir)
-            print(f"✅ Extracted {thumbnails.get('extracted_count', 0)} thumbnail(s)")
+            if results['extracted_count'] > 0:
+                logger.info("✅ Extracted %d thumbnail(s)", results['extracted_count'])
+                logger.info("   📁 Saved to: %s", results['screenshots_dir'])
+            else:
+                logger.info("   ℹ️  No thumbnails found in this workbook")
             
         except Exception as e:
-            print(f"⚠️ Warning: Could not extract thumbnails: {e}")
+            logger.warning("⚠️ Warning: Could not extract thumbnails: %s", e)
             # Don't fail the entire process if thumbnails fail
     
     def _export_legacy_formats(self, data: Dict, tableau_path: str) -> None:
@@ -157,14 +400,11 @@ class EnhancedTableauMigrator:
         # Convert comprehensive data to legacy format for existing exporters
         legacy_data_sources = self._convert_to_legacy_format(data)
         
-        # Create output directory
-        workbook_name = os.path.splitext(os.path.basename(tableau_path))[0]
-        safe_workbook = self._create_safe_filename(workbook_name)
-        output_dir = os.path.join('output', safe_workbook)
-        ensure_directory_exists(output_dir)
+        # Create output directory (resolved once per Tableau file)
+        _, output_dir = self._get_output_dir(tableau_path)
         
         # Export using existing CSV exporter
-        print("💾 Exporting legacy formats...")
+        logger.info("💾 Exporting legacy formats...")
         self.csv_exporter.export_setup_guide_txt(output_dir, legacy_data_sources)
         self.csv_exporter.export_field_mapping_csv(output_dir, legacy_data_sources)
         
@@ -174,22 +414,29 @@ class EnhancedTableauMigrator:
             self.csv_exporter.export_dashboard_usage_csv(output_dir, legacy_data_sources, dashboard_info)
         
         # Extract thumbnails
-        print("🖼️  Extracting thumbnails...")
-        self._extract_thumbnails_legacy(data, output_dir)
+        logger.info("🖼️  Extracting thumbnails...")
+        self._save_thumbnails(output_dir)
     
     def _convert_to_legacy_format(self, comprehensive_data: Dict) -> List[Dict]:
         """Convert comprehensive data to legacy format for existing exporters."""
         legacy_data_sources = []
         
+        datasources = comprehensive_data.get('datasources', [])
+        if not datasources:
+            return legacy_data_sources
+        
+        # Fields are workbook-wide, so convert them once and give each datasource its own copy of the rows
+        legacy_fields = self._convert_fields_to_legacy(comprehensive_data['fields_comprehensive'])
+        
         # Convert datasources
-        for ds in comprehensive_data.get('datasources', []):
+        for ds in datasources:
             legacy_ds = {
                 'name': ds['name'],
                 'caption': ds['caption'],
                 'workbook_name': comprehensive_data['workbook_metadata']['name'],
                 'twbx_path': '',  # Will be set by caller
                 'connections': ds['connections'],
-                'fields': [],
+                'fields': [dict(field) for field in legacy_fields],
                 'field_count': ds['field_count'],
                 'sql_info': {
                     'custom_sql': ds['custom_sql'],
@@ -198,35 +445,40 @@ class EnhancedTableauMigrator:
                 }
             }
             
-            # Convert fields
-            all_fields = (
-                comprehensive_data['fields_comprehensive']['regular_fields'] +
-                comprehensive_data['fields_comprehensive']['calculated_fields'] +
-                comprehensive_data['fields_comprehensive']['parameters']
-            )
-            
-            for field in all_fields:
-                legacy_field = {
-                    'name': field['name'],
-                    'caption': field['caption'],
-                    'datatype': field['datatype'],
-                    'role': field['role'],
-                    'id': field.get('id', field['name']),
-                    'table_name': 'Unknown',
-                    'remote_name': field['name'],
-                    'table_reference': 'Unknown',
-                    'used_in_workbook': len(field.get('used_in_worksheets', [])) > 0,
-                    'is_calculated': field.get('is_calculated', False),
-                    'is_parameter': field.get('is_parameter', False),
-                    'calculation_formula': field.get('calculation_formula', ''),
-                    'calculation_class': 'tableau'
-                }
-                legacy_ds['fields'].append(legacy_field)
-            
             legacy_data_sources.append(legacy_ds)
         
         return legacy_data_sources
     
+    def _convert_fields_to_legacy(self, fields_comprehensive: Dict) -> List[Dict]:
+        """Convert comprehensive regular/calculated/parameter fields to legacy field rows."""
+        all_fields = chain(
+            fields_comprehensive['regular_fields'],
+            fields_comprehensive['calculated_fields'],
+            fields_comprehensive['parameters']
+        )
+        
+        legacy_fields = []
+        append_field = legacy_fields.append
+        for field in all_fields:
+            legacy_field = {
+                'name': field['name'],
+                'caption': field['caption'],
+                'datatype': field['datatype'],
+                'role': field['role'],
+                'id': field.get('id', field['name']),
+                'table_name': 'Unknown',
+                'remote_name': field['name'],
+                'table_reference': 'Unknown',
+                'used_in_workbook': len(field.get('used_in_worksheets', [])) > 0,
+                'is_calculated': field.get('is_calculated', False),
+                'is_parameter': field.get('is_parameter', False),
+                'calculation_formula': field.get('calculation_formula', ''),
+                'calculation_class': 'tableau'
+            }
+            append_field(legacy_field)
+        
+        return legacy_fields
+    
     def _extract_dashboard_info_for_legacy(self, data: Dict) -> Dict:
         """Extract dashboard info in legacy format."""
         dashboard_info = {}
@@ -246,167 +498,56 @@ class EnhancedTableauMigrator:
                 'type': 'dashboard',
                 'width': dashboard['size']['width'],
                 'height': dashboard['size']['height'],
-                'included_worksheets': [obj['name'] for obj in dashboard['contained_objects'] if obj['type'] == 'worksheet'],
+                'included_worksheets': [
+                    name for obj_type, name in map(_OBJECT_TYPE_AND_NAME, dashboard['contained_objects'])
+                    if obj_type == 'worksheet'
+                ],
                 'filters': dashboard['filters']
             }
         
         return dashboard_info
     
-    def _extract_thumbnails_legacy(self, data: Dict, output_dir: str) -> None:
-        """Extract thumbnails using legacy method."""
-        if self.parser and self.parser.get_xml_root():
-            try:
-                results = self.thumbnail_extractor.extract_thumbnails(
-                    self.parser.get_xml_root(), 
-                    output_dir
-                )
-                
-                if results['extracted_count'] > 0:
-                    print(f"   ✅ Successfully extracted {results['extracted_count']} thumbnail(s)")
-                    print(f"   📁 Saved to: {results['screenshots_dir']}")
-                else:
-                    print("   ℹ️  No thumbnails found in this workbook")
-                    
-            except Exception as e:
-                print(f"   ❌ Thumbnail extraction failed: {str(e)}")
-    
     def _create_safe_filename(self, filename: str) -> str:
         """Create a safe filename by removing/replacing special characters."""
-        import re
-        # Replace spaces and special characters with underscores
-        safe_name = re.sub(r'[^\w\-_]', '_', filename)
-        # Remove multiple consecutive underscores
-        safe_name = re.sub(r'_+', '_', safe_name)
-        # Remove leading/trailing underscores
-        safe_name = safe_name.strip('_')
-        return safe_name
+        return _safe_filename(filename)
     
     def generate_powerbi_migration_report(self, comprehensive_data: Dict, output_path: str) -> None:
         """Generate a detailed Power BI migration report."""
+        # Workbook-level values are shared by several report sections; resolve each once
+        view = _ReportView(comprehensive_data)
         report = {
             "migration_summary": {
-                "workbook_name": comprehensive_data['workbook_metadata']['name'],
-                "complexity_score": comprehensive_data['workbook_metadata']['complexity_score'],
-                "total_worksheets": comprehensive_data['workbook_metadata']['total_worksheets'],
-                "total_dashboards": comprehensive_data['workbook_metadata']['total_dashboards'],
-                "total_datasources": comprehensive_data['workbook_metadata']['total_datasources'],
-                "total_fields": comprehensive_data['fields_comprehensive']['total_fields'],
-                "total_calculations": len(comprehensive_data['calculated_fields']),
-                "total_parameters": len(comprehensive_data['parameters']),
-                "estimated_migration_time": self._estimate_migration_time(comprehensive_data)
+                "workbook_name": view.workbook_name,
+                "complexity_score": view.complexity,
+                "total_worksheets": view.total_worksheets,
+                "total_dashboards": view.total_dashboards,
+                "total_datasources": view.total_datasources,
+                "total_fields": view.total_fields,
+                "total_calculations": view.calc_count,
+                "total_parameters": view.param_count,
+                "estimated_migration_time": self._estimate_migration_time(view)
             },
-            "migration_steps": self._generate_detailed_migration_steps(comprehensive_data),
+            "migration_steps": self._generate_detailed_migration_steps(view),
             "data_source_analysis": self._analyze_data_sources(comprehensive_data),
             "visual_migration_plan": self._create_visual_migration_plan(comprehensive_data),
             "calculated_field_migration": self._plan_calculated_field_migration(comprehensive_data),
             "parameter_migration": self._plan_parameter_migration(comprehensive_data),
-            "recommendations": self._generate_migration_recommendations(comprehensive_data)
+            "recommendations": self._generate_migration_recommendations(view)
         }
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        # Encode in one call rather than json.dump's write per token
+        with open(output_path, 'w', encoding='utf-8', buffering=_JSON_WRITE_BUFFER) as f:
+            f.write(json.dumps(report, indent=2, ensure_ascii=False))
         
-        print(f"✅ Power BI migration report generated: {output_path}")
+        logger.info("✅ Power BI migration report generated: %s", output_path)
     
-    def _estimate_migration_time(self, data: Dict) -> str:
+    def _estimate_migration_time(self, view: '_ReportView') -> str:
         """Estimate migration time based on complexity."""
-        complexity = data['workbook_metadata']['complexity_score']
-        worksheet_count = data['workbook_metadata']['total_worksheets']
-        calculation_count = len(data['calculated_fields'])
-        
-        if complexity == "High":
-            base_hours = 8
-        elif complexity == "Medium":
-            base_hours = 4
-        else:
-            base_hours = 2
-        
-        # Add time for worksheets and calculations
-        worksheet_hours = worksheet_count * 0.5
-        calculation_hours = calculation_count * 0.25
-        
-        total_hours = base_hours + worksheet_hours + calculation_hours
-        
-        if total_hours < 4:
-            return f"{total_hours:.1f} hours"
-        elif total_hours < 8:
-            return f"{total_hours:.1f} hours (1 day)"
-        else:
-            days = total_hours / 8
-            return f"{total_hours:.1f} hours ({days:.1f} days)"
+        return _estimate_migration_time(view.complexity, view.total_worksheets, view.calc_count)
     
-    def _generate_detailed_migration_steps(self, data: Dict) -> List[Dict[str, Any]]:
+    def _generate_detailed_migration_steps(self, view: '_ReportView') -> List[Dict[str, Any]]:
         """Generate detailed migration steps."""
-        steps = [
-            {
-                "step": 1,
-                "title": "Data Source Setup",
-                "description": "Set up data sources in Power BI",
-                "estimated_time": "1-2 hours",
-                "details": [
-                    "Connect to data sources using Power Query",
-                    "Configure authentication and connection strings",
-                    "Test data connections"
-                ]
-            },
-            {
-                "step": 2,
-                "title": "Data Model Creation",
-                "description": "Create data model and relationships",
-                "estimated_time": "2-4 hours",
-                "details": [
-                    "Import data tables",
-                    "Create relationships between tables",
-                    "Set up data types and formatting"
-                ]
-            },
-            {
-                "step": 3,
-                "title": "Calculated Fields Migration",
-                "description": f"Migrate {len(data['calculated_fields'])} calculated fields",
-                "estimated_time": f"{len(data['calculated_fields']) * 0.25:.1f} hours",
-                "details": [
-                    "Convert Tableau formulas to DAX",
-                    "Create measures and calculated columns",
-                    "Test calculation results"
-                ]
-            },
-            {
-                "step": 4,
-                "title": "Visual Creation",
-                "description": f"Create {data['workbook_metadata']['total_worksheets']} visuals",
-                "estimated_time": f"{data['workbook_metadata']['total_worksheets'] * 0.5:.1f} hours",
-                "details": [
-                    "Create visuals matching Tableau worksheets",
-                    "Configure field placements and formatting",
-                    "Set up filters and interactions"
-                ]
-            },
-            {
-                "step": 5,
-                "title": "Dashboard Creation",
-                "description": f"Create {data['workbook_metadata']['total_dashboards']} dashboard pages",
-                "estimated_time": f"{data['workbook_metadata']['total_dashboards'] * 1:.1f} hours",
-                "details": [
-                    "Create report pages",
-                    "Arrange visuals and configure layout",
-                    "Set up page-level filters"
-                ]
-            },
-            {
-                "step": 6,
-                "title": "Testing and Validation",
-                "description": "Test and validate migration results",
-                "estimated_time": "2-4 hours",
-                "details": [
-                    "Compare results with original Tableau workbook",
-                    "Test all interactions and filters",
-                    "Validate data accuracy"
-                ]
-            }
-        ]
-        
-        return steps
+        return _detailed_migration_steps(view.calc_count, view.total_worksheets, view.total_dashboards)
     
     def _analyze_data_sources(self, data: Dict) -> Dict[str, Any]:
         """Analyze data sources for migration complexity."""
@@ -417,19 +558,18 @@ class EnhancedTableauMigrator:
             "migration_notes": []
         }
         
-        for ds in data['datasources']:
-            for conn in ds['connections']:
-                dbclass = conn.get('dbclass', 'Unknown')
-                if dbclass not in analysis['connection_types']:
-                    analysis['connection_types'][dbclass] = 0
-                analysis['connection_types'][dbclass] += 1
+        connection_types = analysis['connection_types']
+        migration_notes = analysis['migration_notes']
+        connection_types.update(Counter(
+            conn.get('dbclass', 'Unknown') for ds in data['datasources'] for conn in ds['connections']
+        ))
         
         # Add migration notes based on connection types
-        if 'bigquery' in analysis['connection_types']:
-            analysis['migration_notes'].append("BigQuery connections require proper authentication setup in Power BI")
+        if 'bigquery' in connection_types:
+            migration_notes.append("BigQuery connections require proper authentication setup in Power BI")
         
-        if 'sqlserver' in analysis['connection_types']:
-            analysis['migration_notes'].append("SQL Server connections may need gateway configuration")
+        if 'sqlserver' in connection_types:
+            migration_notes.append("SQL Server connections may need gateway configuration")
         
         return analysis
     
@@ -452,27 +592,16 @@ class EnhancedTableauMigrator:
     
     def _map_to_powerbi_visual(self, tableau_chart_type: str) -> str:
         """Map Tableau chart type to Power BI visual type."""
-        mapping = {
-            'Bar Chart': 'Clustered Bar Chart',
-            'Line Chart': 'Line Chart',
-            'Scatter Plot': 'Scatter Chart',
-            'Table': 'Table',
-            'Map': 'Map',
-            'Pie Chart': 'Pie Chart',
-            'Heatmap': 'Matrix',
-            'Treemap': 'Treemap'
-        }
-        return mapping.get(tableau_chart_type, 'Clustered Bar Chart')
+        return _POWERBI_VISUAL_MAP.get(tableau_chart_type, 'Clustered Bar Chart')
     
     def _assess_visual_difficulty(self, worksheet: Dict) -> str:
         """Assess migration difficulty for a visual."""
         chart_type = worksheet['chart_type']
         field_count = len(worksheet['used_fields'])
-        filter_count = len(worksheet['filters'])
         
-        if chart_type in ['Table', 'Bar Chart'] and field_count < 3 and filter_count == 0:
+        if chart_type in _EASY_VISUAL_CHART_TYPES and field_count < 3 and not worksheet['filters']:
             return "Easy"
-        elif chart_type in ['Line Chart', 'Scatter Plot'] and field_count < 5:
+        elif chart_type in _MEDIUM_VISUAL_CHART_TYPES and field_count < 5:
             return "Medium"
         else:
             return "Hard"
@@ -486,19 +615,22 @@ class EnhancedTableauMigrator:
             "dax_conversions": []
         }
         
-        for calc in data['calculated_fields']:
-            complexity = calc['complexity']
-            plan['complexity_breakdown'][complexity] += 1
-            
+        calculated_fields = data['calculated_fields']
+        complexity_breakdown = Counter(plan['complexity_breakdown'])
+        complexity_breakdown.update(calc['complexity'] for calc in calculated_fields)
+        plan['complexity_breakdown'] = dict(complexity_breakdown)
+        
+        dax_conversions = plan['dax_conversions']
+        for calc in calculated_fields:
             if calc['powerbi_equivalent']:
-                plan['dax_conversions'].append({
+                dax_conversions.append({
                     "tableau_formula": calc['formula'],
                     "dax_equivalent": calc['powerbi_equivalent'],
-                    "complexity": complexity
+                    "complexity": calc['complexity']
                 })
         
         # Add migration notes
-        if plan['complexity_breakdown']['Complex'] > 0:
+        if complexity_breakdown['Complex'] > 0:
             plan['migration_notes'].append("Some complex calculations may require manual review and testing")
         
         return plan
@@ -512,35 +644,83 @@ class EnhancedTableauMigrator:
             "notes": []
         }
         
-        for param in data['parameters']:
-            param_type = param['type']
-            if param_type not in plan['parameter_types']:
-                plan['parameter_types'][param_type] = 0
-            plan['parameter_types'][param_type] += 1
+        plan['parameter_types'] = dict(Counter(param['type'] for param in data['parameters']))
         
         return plan
     
-    def _generate_migration_recommendations(self, data: Dict) -> List[str]:
+    def _generate_migration_recommendations(self, view: '_ReportView') -> List[str]:
         """Generate migration recommendations."""
         recommendations = []
         
-        complexity = data['workbook_metadata']['complexity_score']
+        complexity = view.complexity
         
         if complexity == "High":
             recommendations.append("Consider breaking this workbook into multiple Power BI reports")
             recommendations.append("Plan for extended testing and validation phase")
         
-        if len(data['calculated_fields']) > 10:
+        if view.calc_count > 10:
             recommendations.append("Review calculated fields for optimization opportunities")
         
-        if data['workbook_metadata']['total_worksheets'] > 20:
+        if view.total_worksheets > 20:
             recommendations.append("Consider organizing visuals into multiple report pages")
         
-        recommendations.extend([
-            "Set up proper data refresh schedules in Power BI",
-            "Configure row-level security if needed",
-            "Plan for user training on Power BI interface",
-            "Consider using Power BI Premium for better performance"
-        ])
+        recommendations.extend(_GENERAL_RECOMMENDATIONS)
         
         return recommendations
+
+
+class _ReportView:
+    """Read-only view over comprehensive data with workbook-level values cached for report building."""
+    
+    def __init__(self, data: Dict):
+        self.data = data
+    
+    @functools.cached_property
+    def workbook_metadata(self) -> Dict:
+        return self.data['workbook_metadata']
+    
+    @functools.cached_property
+    def workbook_name(self) -> str:
+        return self.workbook_metadata['name']
+    
+    @functools.cached_property
+    def complexity(self) -> str:
+        return self.workbook_metadata['complexity_score']
+    
+    @functools.cached_property
+    def total_worksheets(self) -> int:
+        return self.workbook_metadata['total_worksheets']
+    
+    @functools.cached_property
+    def total_dashboards(self) -> int:
+        return self.workbook_metadata['total_dashboards']
+    
+    @functools.cached_property
+    def total_datasources(self) -> int:
+        return self.workbook_metadata['total_datasources']
+    
+    @functools.cached_property
+    def total_fields(self) -> int:
+        return self.data['fields_comprehensive']['total_fields']
+    
+    @functools.cached_property
+    def calc_count(self) -> int:
+        return len(self.data['calculated_fields'])
+    
+    @functools.cached_property
+    def param_count(self) -> int:
+        return len(self.data['parameters'])
+
+
+def _group_by_output_folder(tableau_paths: List[str]) -> List[List[int]]:
+    """Group input indices by the output folder each file writes to, in first-seen order."""
+    groups = {}
+    for index, tableau_path in enumerate(tableau_paths):
+        workbook_name = os.path.splitext(os.path.basename(tableau_path))[0]
+        groups.setdefault(_safe_filename(workbook_name), []).append(index)
+    return list(groups.values())
+
+
+def _process_files_comprehensive(migrator_cls, tableau_paths: List[str], output_format: str) -> List[Dict]:
+    """Process Tableau files that share an output folder in order, each with a fresh migrator (worker for process_many)."""
+    return [migrator_cls().process_tableau_file_comprehensive(path, output_format) for path in tableau_paths]
@@ -5,18 +5,42 @@ This module extracts comprehensive field definitions for troubleshooting and dev
 It captures ALL available field metadata from both the Tableau Document API and raw XML parsing.
 """
 
+import logging
 import xml.etree.ElementTree as ET
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+# Name prefixes Tableau uses for its own generated fields
+_INTERNAL_PREFIXES = ('__tableau_', '_.fcp.')
+
+# connection_info key -> <connection> XML attribute
+_CONNECTION_ATTRIBUTES = (
+    ("server", 'server'),
+    ("dbname", 'dbname'),
+    ("username", 'username'),
+    ("authentication", 'authentication'),
+    ("class", 'class'),
+    ("port", 'port'),
+    ("schema", 'schema'),
+    ("table", 'table'),
+    ("query", 'query'),
+    ("custom_sql", 'custom-sql')
+)
 
 
 class FieldDefinitionsExtractor:
     """Extracts comprehensive field definitions for universal troubleshooting."""
     
+    __slots__ = ('field_definitions', '_field_index', '_saw_xml_attributes', '_saw_connection_info')
+    
     def __init__(self):
         self.field_definitions = {
             "extraction_metadata": {
-                "extracted_at": datetime.now().isoformat(),
+                "extracted_at": None,  # Stamped when extraction runs
                 "extractor_version": "1.0.0",
                 "purpose": "Universal field definitions for troubleshooting and development"
             },
@@ -31,9 +55,15 @@ class FieldDefinitionsExtractor:
             "data_source_relationships": {},
             "field_dependencies": {}
         }
+        # (datasource, field name) -> field definition, first one registered wins
+        self._field_index = {}
+        # Completeness flags, recorded while extracting instead of rescanning the results
+        self._saw_xml_attributes = False
+        self._saw_connection_info = False
     
     def extract_all_field_definitions(self, workbook, xml_root: ET.Element) -> Dict[str, Any]:
         """Extract comprehensive field definitions from workbook and XML."""
+        self.field_definitions["extraction_metadata"]["extracted_at"] = datetime.now().isoformat()
         try:
             # Extract from Document API
             self._extract_from_document_api(workbook)
@@ -47,22 +77,26 @@ class FieldDefinitionsExtractor:
             return self.field_definitions
             
         except Exception as e:
-            print(f"Error extracting field definitions: {e}")
+            logger.error("Error extracting field definitions: %s", e)
             return self.field_definitions
     
     def _extract_from_document_api(self, workbook):
         """Extract field definitions using the Tableau Document API."""
+        relationships = self.field_definitions["data_source_relationships"]
+        categories = self.field_definitions["field_categories"]
         try:
             for datasource in workbook.datasources:
                 datasource_name = datasource.name
                 
                 # Track data source relationships
-                if datasource_name not in self.field_definitions["data_source_relationships"]:
-                    self.field_definitions["data_source_relationships"][datasource_name] = {
+                if datasource_name not in relationships:
+                    relationships[datasource_name] = {
                         "connection_info": {},
                         "field_count": 0,
-                        "field_types": {}
+                        "field_types": Counter()
                     }
+                ds_relationship = relationships[datasource_name]
+                field_types = ds_relationship["field_types"]
                 
                 # Extract connection information
                 for connection in datasource.connections:
@@ -77,55 +111,43 @@ class FieldDefinitionsExtractor:
                         "table": getattr(connection, 'table', ''),
                         "query": getattr(connection, 'query', '')
                     }
-                    self.field_definitions["data_source_relationships"][datasource_name]["connection_info"] = conn_info
+                    ds_relationship["connection_info"] = conn_info
+                    self._saw_connection_info = True
                 
                 # Extract all fields from this datasource using the proper API
                 for field_name, field in datasource.fields.items():
                     field_def = self._extract_field_definition_from_api(field, datasource_name)
                     
                     # Categorize field using proper API methods
-                    if self._is_parameter_from_api(field):
-                        self.field_definitions["field_categories"]["parameters"].append(field_def)
-                    elif self._is_calculated_field_from_api(field):
-                        self.field_definitions["field_categories"]["calculated_fields"].append(field_def)
-                    elif self._is_table_field_from_api(field):
-                        self.field_definitions["field_categories"]["table_fields"].append(field_def)
-                    elif self._is_internal_field_from_api(field):
-                        self.field_definitions["field_categories"]["internal_fields"].append(field_def)
-                    else:
-                        self.field_definitions["field_categories"]["regular_fields"].append(field_def)
+                    categories[self._classify_field_from_api(field, field_def)].append(field_def)
                     
                     # Update data source tracking
-                    self.field_definitions["data_source_relationships"][datasource_name]["field_count"] += 1
-                    field_type = field.datatype if field.datatype else 'unknown'
-                    if field_type not in self.field_definitions["data_source_relationships"][datasource_name]["field_types"]:
-                        self.field_definitions["data_source_relationships"][datasource_name]["field_types"][field_type] = 0
-                    self.field_definitions["data_source_relationships"][datasource_name]["field_types"][field_type] += 1
+                    ds_relationship["field_count"] += 1
+                    field_type = field_def["datatype"] or 'unknown'
+                    field_types[field_type] += 1
                     
         except Exception as e:
-            print(f"Error extracting from Document API: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error extracting from Document API: %s", e)
     
     def _extract_field_definition_from_api(self, field, datasource_name: str) -> Dict[str, Any]:
         """Extract comprehensive field definition from Document API field object."""
         field_def = {
-            "name": field.name if hasattr(field, 'name') else 'Unknown',
-            "id": field.id if hasattr(field, 'id') else 'Unknown',
-            "caption": field.caption if hasattr(field, 'caption') else '',
-            "alias": field.alias if hasattr(field, 'alias') else '',
-            "datatype": field.datatype if hasattr(field, 'datatype') else 'unknown',
-            "role": field.role if hasattr(field, 'role') else 'unknown',
-            "type": field.type if hasattr(field, 'type') else 'unknown',
-            "hidden": field.hidden if hasattr(field, 'hidden') else 'false',
-            "calculation": field.calculation if hasattr(field, 'calculation') else None,
-            "description": field.description if hasattr(field, 'description') else '',
-            "default_aggregation": field.default_aggregation if hasattr(field, 'default_aggregation') else None,
+            "name": getattr(field, 'name', 'Unknown'),
+            "id": getattr(field, 'id', 'Unknown'),
+            "caption": getattr(field, 'caption', ''),
+            "alias": getattr(field, 'alias', ''),
+            "datatype": getattr(field, 'datatype', 'unknown'),
+            "role": getattr(field, 'role', 'unknown'),
+            "type": getattr(field, 'type', 'unknown'),
+            "hidden": getattr(field, 'hidden', 'false'),
+            "calculation": getattr(field, 'calculation', None),
+            "description": getattr(field, 'description', ''),
+            "default_aggregation": getattr(field, 'default_aggregation', None),
             "datasource": datasource_name,
             "api_attributes": {},
             "xml_attributes": {},
             "usage_info": {
-                "used_in_worksheets": field.worksheets if hasattr(field, 'worksheets') else [],
+                "used_in_worksheets": getattr(field, 'worksheets', []),
                 "used_in_dashboards": [],
                 "filter_usage": [],
                 "calculation_dependencies": []
@@ -134,77 +156,75 @@ class FieldDefinitionsExtractor:
         
         # Capture additional API attributes
         api_attrs = {
-            'is_quantitative': field.is_quantitative if hasattr(field, 'is_quantitative') else False,
-            'is_ordinal': field.is_ordinal if hasattr(field, 'is_ordinal') else False,
-            'is_nominal': field.is_nominal if hasattr(field, 'is_nominal') else False,
-            'aliases': field.aliases if hasattr(field, 'aliases') else {}
+            'is_quantitative': getattr(field, 'is_quantitative', False),
+            'is_ordinal': getattr(field, 'is_ordinal', False),
+            'is_nominal': getattr(field, 'is_nominal', False),
+            'aliases': getattr(field, 'aliases', {})
         }
         field_def["api_attributes"] = api_attrs
         
+        self._field_index.setdefault((datasource_name, field_def["name"]), field_def)
+        
         return field_def
     
     def _extract_from_xml(self, xml_root: ET.Element):
         """Extract additional field details from XML that might not be in Document API."""
         try:
-            # Find all datasources in XML
-            for datasource in xml_root.findall('.//datasource'):
+            # Find all datasources in XML (Element.iter walks the tree in C, unlike './/' paths)
+            for datasource in xml_root.iter('datasource'):
                 datasource_name = datasource.get('name', 'Unknown')
                 
                 # Extract connection information
                 connection_info = self._extract_connection_info_from_xml(datasource)
                 if connection_info:
                     self.field_definitions["data_source_relationships"][datasource_name]["connection_info"] = connection_info
+                    self._saw_connection_info = True
                 
                 # Extract detailed field information from XML
-                for column in datasource.findall('.//column'):
+                for column in datasource.iter('column'):
                     self._extract_column_details_from_xml(column, datasource_name)
                     
         except Exception as e:
-            print(f"Error extracting from XML: {e}")
+            logger.error("Error extracting from XML: %s", e)
     
     def _extract_connection_info_from_xml(self, datasource_elem) -> Dict[str, Any]:
         """Extract connection information from datasource XML element."""
         connection_info = {}
         
         # Check for connection element
-        connection = datasource_elem.find('.//connection')
+        connection = next(datasource_elem.iter('connection'), None)
         if connection is not None:
-            connection_info = {
-                "server": connection.get('server', ''),
-                "dbname": connection.get('dbname', ''),
-                "username": connection.get('username', ''),
-                "authentication": connection.get('authentication', ''),
-                "class": connection.get('class', ''),
-                "port": connection.get('port', ''),
-                "schema": connection.get('schema', ''),
-                "table": connection.get('table', ''),
-                "query": connection.get('query', ''),
-                "custom_sql": connection.get('custom-sql', '')
-            }
+            attrib = connection.attrib
+            connection_info = {key: attrib.get(name, '') for key, name in _CONNECTION_ATTRIBUTES}
         
         # Check for inline data
         if datasource_elem.get('inline') == 'true':
             connection_info["type"] = "inline"
-            connection_info["has_connection"] = datasource_elem.get('hasconnection', 'false') == 'true'
+            connection_info["has_connection"] = datasource_elem.get('hasconnection') == 'true'
         
         return connection_info
     
     def _extract_column_details_from_xml(self, column_elem, datasource_name: str):
         """Extract detailed column information from XML column element."""
-        column_name = column_elem.get('name', '')
+        # Snapshot the attributes once; every lookup below reads this dict
+        attrib = dict(column_elem.attrib)
+        column_name = attrib.get('name', '')
         if not column_name:
             return
         
+        # <calculation> is always a direct child of its <column>
+        calculation = column_elem.find('calculation')
+        
         # Find the corresponding field definition or create a new one
         field_def = self._find_field_definition(column_name, datasource_name)
         if not field_def:
             # Create a new field definition from XML
             field_def = {
                 "name": column_name,
-                "caption": column_elem.get('caption', ''),
-                "datatype": column_elem.get('datatype', 'unknown'),
-                "role": column_elem.get('role', 'unknown'),
-                "type": column_elem.get('type', 'unknown'),
+                "caption": attrib.get('caption', ''),
+                "datatype": attrib.get('datatype', 'unknown'),
+                "role": attrib.get('role', 'unknown'),
+                "type": attrib.get('type', 'unknown'),
                 "datasource": datasource_name,
                 "api_attributes": {},
                 "xml_attributes": {},
@@ -215,28 +235,17 @@ class FieldDefinitionsExtractor:
                     "calculation_dependencies": []
                 }
             }
+            self._field_index[(datasource_name, column_name)] = field_def
             
             # Add to appropriate category
-            if self._is_parameter_from_xml(column_elem):
-                self.field_definitions["field_categories"]["parameters"].append(field_def)
-            elif self._is_calculated_field_from_xml(column_elem):
-                self.field_definitions["field_categories"]["calculated_fields"].append(field_def)
-            elif self._is_table_field_from_xml(column_elem):
-                self.field_definitions["field_categories"]["table_fields"].append(field_def)
-            elif self._is_internal_field_from_xml(column_elem):
-                self.field_definitions["field_categories"]["internal_fields"].append(field_def)
-            else:
-                self.field_definitions["field_categories"]["regular_fields"].append(field_def)
+            category = self._classify_column_from_xml(attrib, calculation)
+            self.field_definitions["field_categories"][category].append(field_def)
         
         # Extract XML-specific attributes
-        xml_attrs = {}
-        for attr_name, attr_value in column_elem.attrib.items():
-            xml_attrs[attr_name] = attr_value
-        
-        field_def["xml_attributes"] = xml_attrs
+        field_def["xml_attributes"] = attrib
+        self._saw_xml_attributes = True
         
         # Extract calculation details if present
-        calculation = column_elem.find('.//calculation')
         if calculation is not None:
             field_def["calculation_details"] = {
                 "class": calculation.get('class', ''),
@@ -245,10 +254,10 @@ class FieldDefinitionsExtractor:
             }
         
         # Extract parameter details if present
-        if 'param-domain-type' in column_elem.attrib:
+        if 'param-domain-type' in attrib:
             field_def["parameter_details"] = {
-                "domain_type": column_elem.get('param-domain-type', ''),
-                "current_value": column_elem.get('value', ''),
+                "domain_type": attrib['param-domain-type'],
+                "current_value": attrib.get('value', ''),
                 "allowed_values": self._extract_parameter_values(column_elem)
             }
     
@@ -262,16 +271,16 @@ class FieldDefinitionsExtractor:
         }
         
         # Look for value elements
-        for value_elem in column_elem.findall('.//value'):
+        for value_elem in column_elem.iter('value'):
             value_info = {
                 "value": value_elem.get('value', ''),
                 "caption": value_elem.get('caption', ''),
-                "null": value_elem.get('null', 'false') == 'true'
+                "null": value_elem.get('null') == 'true'
             }
             values_info["values"].append(value_info)
         
         # Look for range information
-        range_elem = column_elem.find('.//range')
+        range_elem = next(column_elem.iter('range'), None)
         if range_elem is not None:
             values_info["range"] = {
                 "min": range_elem.get('min', ''),
@@ -283,65 +292,36 @@ class FieldDefinitionsExtractor:
     
     def _find_field_definition(self, field_name: str, datasource_name: str) -> Optional[Dict[str, Any]]:
         """Find a field definition by name and datasource."""
-        for category in self.field_definitions["field_categories"].values():
-            for field_def in category:
-                if (field_def.get("name") == field_name and 
-                    field_def.get("datasource") == datasource_name):
-                    return field_def
-        return None
-    
-    def _is_parameter_from_api(self, field) -> bool:
-        """Check if field is a parameter using Document API."""
-        try:
-            # Check XML attributes for parameter-specific markers
-            if hasattr(field, 'xml') and field.xml is not None:
-                return 'param-domain-type' in field.xml.attrib
-            return False
-        except:
-            return False
-    
-    def _is_calculated_field_from_api(self, field) -> bool:
-        """Check if field is a calculated field using Document API."""
-        try:
-            return field.calculation is not None
-        except:
-            return False
-    
-    def _is_table_field_from_api(self, field) -> bool:
-        """Check if field represents a table using Document API."""
-        try:
-            return field.datatype == 'table'
-        except:
-            return False
+        return self._field_index.get((datasource_name, field_name))
     
-    def _is_internal_field_from_api(self, field) -> bool:
-        """Check if field is an internal Tableau field using Document API."""
-        try:
-            name = field.id if hasattr(field, 'id') else field.name
-            return (name.startswith('__tableau_') or 
-                   name.startswith('_.fcp.') or
-                   'internal' in name.lower())
-        except:
-            return False
-    
-    def _is_parameter_from_xml(self, column_elem) -> bool:
-        """Check if field is a parameter based on XML attributes."""
-        return 'param-domain-type' in column_elem.attrib
-    
-    def _is_calculated_field_from_xml(self, column_elem) -> bool:
-        """Check if field is a calculated field based on XML attributes."""
-        return column_elem.find('.//calculation') is not None
+    def _classify_field_from_api(self, field, field_def: Dict[str, Any]) -> str:
+        """Return the field category for a Document API field, reusing the values already in field_def."""
+        # Check XML attributes for parameter-specific markers
+        xml = getattr(field, 'xml', None)
+        if xml is not None and 'param-domain-type' in xml.attrib:
+            return "parameters"
+        if field_def["calculation"] is not None:
+            return "calculated_fields"
+        if field_def["datatype"] == 'table':
+            return "table_fields"
+        # Fields without an id are never internal
+        name = field_def["id"] or ''
+        if name.startswith(_INTERNAL_PREFIXES) or 'internal' in name.lower():
+            return "internal_fields"
+        return "regular_fields"
     
-    def _is_table_field_from_xml(self, column_elem) -> bool:
-        """Check if field represents a table based on XML attributes."""
-        return column_elem.get('datatype', '') == 'table'
-    
-    def _is_internal_field_from_xml(self, column_elem) -> bool:
-        """Check if field is an internal Tableau field based on XML attributes."""
-        name = column_elem.get('name', '')
-        return (name.startswith('__tableau_') or 
-               name.startswith('_.fcp.') or
-               'internal' in name.lower())
+    def _classify_column_from_xml(self, attrib: Dict[str, str], calculation) -> str:
+        """Return the field category for an XML column from its attributes and <calculation> child."""
+        if 'param-domain-type' in attrib:
+            return "parameters"
+        if calculation is not None:
+            return "calculated_fields"
+        if attrib.get('datatype', '') == 'table':
+            return "table_fields"
+        name = attrib.get('name', '')
+        if name.startswith(_INTERNAL_PREFIXES) or 'internal' in name.lower():
+            return "internal_fields"
+        return "regular_fields"
     
     def _analyze_field_relationships(self):
         """Analyze relationships between fields and their usage."""
@@ -359,7 +339,7 @@ class FieldDefinitionsExtractor:
             }
             
         except Exception as e:
-            print(f"Error analyzing field relationships: {e}")
+            logger.error("Error analyzing field relationships: %s", e)
     
     def _assess_extraction_completeness(self) -> Dict[str, Any]:
         """Assess how complete the field extraction is."""
@@ -377,8 +357,7 @@ class FieldDefinitionsExtractor:
             completeness["has_api_data"] = True
         
         # Check for XML data
-        if any(field.get("xml_attributes") for category in self.field_definitions["field_categories"].values() 
-               for field in category):
+        if self._saw_xml_attributes:
             completeness["has_xml_data"] = True
         
         # Check for calculations
@@ -390,7 +369,7 @@ class FieldDefinitionsExtractor:
             completeness["has_parameters"] = True
         
         # Check for connections
-        if any(ds.get("connection_info") for ds in self.field_definitions["data_source_relationships"].values()):
+        if self._saw_connection_info:
             completeness["has_connections"] = True
         
         return completeness
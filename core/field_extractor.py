@@ -4,7 +4,40 @@ Field Extractor Module
 Handles field metadata extraction and usage tracking
 """
 
+import re
+import sys
+import copy
+import logging
+import functools
 import xml.etree.ElementTree as ET
+from .file_utils import BRACKET_CLEAN_TABLE
+
+logger = logging.getLogger(__name__)
+
+
+# Leading numbering such as "1. " in field captions
+_LEADING_NUMBER = re.compile(r'^\d+\.?\s*')
+
+# Bracketed field references such as [Calculation_1234567890] in calculation formulas
+_BRACKETED_REFERENCE = re.compile(r'\[([^\[\]]*)\]')
+
+# Bracketed internal calculation IDs such as [Calculation_1234567890]
+_CALCULATION_REFERENCE = re.compile(r'\[Calculation_(\d+)\]')
+
+# Metadata-record aggregations that mark a column as a measure
+_MEASURE_AGGS = frozenset(('Sum', 'Count', 'Average', 'Min', 'Max'))
+
+# Column order of the columnar field table; the low-cardinality ones are stored as categoricals
+_COLUMNAR_FIELDS = ('table_reference', 'remote_name', 'data_type', 'role',
+                    'aggregation', 'parent_table', 'used_in_workbook')
+_CATEGORICAL_FIELDS = ('table_reference', 'data_type', 'role', 'aggregation', 'parent_table')
+
+# Filter description per groupfilter function: (prefix for listed values, text without values)
+_FILTER_DESCRIPTIONS = {
+    'union': ('Show only: ', 'Include specific values'),
+    'except': ('Exclude: ', 'Exclude specific values'),
+    'level-members': (None, 'Show all values in level'),
+}
 
 
 class FieldExtractor:
@@ -13,13 +46,75 @@ class FieldExtractor:
     def __init__(self, xml_root, workbook):
         self.xml_root = xml_root
         self.workbook = workbook
+        # Workbook-wide dashboard/worksheet info, built on first request for this xml_root
+        self._dashboard_info = None
+        self._dashboard_info_root = None
+    
+    @classmethod
+    def from_path(cls, path):
+        """Parse a .twb/.twbx file and create an extractor for it."""
+        from .tableau_parser import TableauParser
+        
+        parser = TableauParser(path)
+        if not parser.extract_and_parse():
+            raise ValueError(f"Could not parse {path}")
+        return cls(parser.get_xml_root(), parser.get_workbook())
+    
+    @functools.cached_property
+    def _datasources_by_name(self):
+        """Map each datasource name to its first <datasource> element in the workbook XML."""
+        datasources_by_name = {}
+        for datasource in self.xml_root.iter('datasource'):
+            datasources_by_name.setdefault(datasource.get('name'), datasource)
+        return datasources_by_name
+    
+    @functools.cached_property
+    def _calculated_columns(self):
+        """All <column> elements with a direct <calculation> child, in document order."""
+        return [
+            column for column in self.xml_root.iter('column')
+            if column.find('calculation') is not None
+        ]
+    
+    @functools.cached_property
+    def _calculated_column_names(self):
+        """Names of columns with a <calculation> anywhere below them, as the Document API reads it."""
+        return {
+            column.get('name') for column in self.xml_root.iter('column')
+            if column.find('.//calculation') is not None
+        }
+    
+    @functools.cached_property
+    def _parameter_columns_by_name(self):
+        """Map each parameter column name to its first <column param-domain-type=...> element."""
+        parameter_columns = {}
+        for column in self.xml_root.iter('column'):
+            if column.get('param-domain-type') is not None:
+                parameter_columns.setdefault(column.get('name'), column)
+        return parameter_columns
+    
+    @functools.cached_property
+    def _used_field_names(self):
+        """Bracket-free names of Document API fields used on at least one worksheet."""
+        used_field_names = []
+        for datasource in self.workbook.datasources:
+            # According to API docs, datasource.fields returns key-value pairs
+            if hasattr(datasource, 'fields') and hasattr(datasource.fields, 'items'):
+                for field_name, field_attrs in datasource.fields.items():
+                    # Check if this field is used in any worksheets
+                    if hasattr(field_attrs, 'worksheets') and field_attrs.worksheets:
+                        # Clean the field name (remove brackets and extra info)
+                        used_field_names.append(field_name.translate(BRACKET_CLEAN_TABLE))
+        return used_field_names
     
     def clean_field_name(self, field_name):
         """Clean field name by removing numbers at the beginning and extra spaces."""
-        import re
+        # Most names don't start with a digit, so skip the regex for them
+        if not field_name or not field_name[0].isdigit():
+            return field_name.strip()
         
         # Remove numbers and dots at the beginning (e.g., "1. Period" -> "Period")
-        cleaned = re.sub(r'^\d+\.?\s*', '', field_name)
+        cleaned = _LEADING_NUMBER.sub('', field_name)
         
         # Remove extra spaces
         cleaned = cleaned.strip()
@@ -33,181 +128,206 @@ class FieldExtractor:
         
         field_metadata = {}
         
-        # Find the datasource in XML
-        for datasource in self.xml_root.findall('.//datasource'):
-            if datasource.get('name') == datasource_name:
-                # Extract field mappings from <cols> section
-                cols_section = datasource.find('.//cols')
-                if cols_section is not None:
-                    for col_map in cols_section.findall('map'):
-                        key = col_map.get('key', '').replace('[', '').replace(']', '')
-                        value = col_map.get('value', '').replace('[', '').replace(']', '')
-                        
-                        # Parse the value to get table and field separately
-                        if '.' in value:
-                            table_name, field_name = value.split('.', 1)
-                        else:
-                            table_name = value
-                            field_name = key
-                        
-                        field_metadata[key] = {
-                            'table_reference': table_name,  # Just the table name, not table.field
-                            'table_name': table_name,
-                            'remote_name': field_name,  # The actual field name from database
-                            'used_in_workbook': False  # Will be updated below
-                        }
+        # Find the datasource in XML (indexed once per workbook)
+        datasource = self._datasources_by_name.get(datasource_name)
+        if datasource is None:
+            return field_metadata
+        
+        # Extract field mappings from <cols> section
+        cols_section = next(datasource.iter('cols'), None)
+        if cols_section is not None:
+            for col_map in cols_section.iterfind('map'):
+                key = col_map.get('key', '').translate(BRACKET_CLEAN_TABLE)
+                value = col_map.get('value', '').translate(BRACKET_CLEAN_TABLE)
                 
-                # Extract detailed metadata from <metadata-records> section
-                metadata_section = datasource.find('.//metadata-records')
-                if metadata_section is not None:
-                    for record in metadata_section.findall("metadata-record[@class='column']"):
-                        local_name = record.find('local-name')
-                        if local_name is not None:
-                            field_name = local_name.text.replace('[', '').replace(']', '')
-                            
-                            # Get data type
-                            local_type = record.find('local-type')
-                            data_type = local_type.text if local_type is not None else 'Unknown'
-                            
-                            # Get aggregation and role separately
-                            aggregation = record.find('aggregation')
-                            aggregation_text = aggregation.text if aggregation is not None else 'None'
-                            
-                            # Determine role based on aggregation type
-                            if aggregation_text in ['Sum', 'Count', 'Average', 'Min', 'Max']:
-                                role = 'measure'
-                            elif aggregation_text == 'None':
-                                role = 'dimension'
-                            else:
-                                role = 'dimension'  # Default to dimension for other cases
-                            
-                            # Get parent table
-                            parent_name = record.find('parent-name')
-                            parent_table = str(parent_name.text).replace('[', '').replace(']', '') if parent_name is not None and parent_name.text is not None else 'Unknown'
-                            
-                            # Get remote name (original database field)
-                            remote_name = record.find('remote-name')
-                            remote_field = str(remote_name.text) if remote_name is not None and remote_name.text is not None else field_name
-                            
-                            # Update field metadata with rich information
-                            if field_name in field_metadata:
-                                field_metadata[field_name].update({
-                                    'data_type': data_type,
-                                    'role': role,
-                                    'aggregation': aggregation_text,
-                                    'parent_table': parent_table,
-                                    'remote_name': remote_field
-                                })
-                            else:
-                                field_metadata[field_name] = {
-                                    'data_type': data_type,
-                                    'role': role,
-                                    'aggregation': aggregation_text,
-                                    'parent_table': parent_table,
-                                    'remote_name': remote_field,
-                                    'table_reference': parent_table,  # Just the table name
-                                    'table_name': parent_table,
-                                    'used_in_workbook': False
-                                }
+                # Parse the value to get table and field separately
+                table_name, separator, field_name = value.partition('.')
+                if not separator:
+                    field_name = key
+                # Many columns share a table, so keep one copy of each table name
+                table_name = sys.intern(table_name)
                 
-                # Now check for field usage across the entire workbook
-                self.track_field_usage(field_metadata)
-                break
+                field_metadata[key] = {
+                    'table_reference': table_name,  # Just the table name, not table.field
+                    'table_name': table_name,
+                    'remote_name': field_name,  # The actual field name from database
+                    'used_in_workbook': False  # Will be updated below
+                }
+        
+        # Extract detailed metadata from <metadata-records> section
+        metadata_section = next(datasource.iter('metadata-records'), None)
+        if metadata_section is not None:
+            for record in metadata_section.iterfind("metadata-record[@class='column']"):
+                # Index the record's children by tag in one pass; the first child of each tag wins, like find()
+                children = {}
+                for child in record:
+                    children.setdefault(child.tag, child)
+                
+                local_name = children.get('local-name')
+                if local_name is not None:
+                    field_name = local_name.text.translate(BRACKET_CLEAN_TABLE)
+                    
+                    # Get data type
+                    local_type = children.get('local-type')
+                    data_type = local_type.text if local_type is not None else 'Unknown'
+                    if data_type is not None:
+                        data_type = sys.intern(data_type)
+                    
+                    # Get aggregation and role separately
+                    aggregation = children.get('aggregation')
+                    aggregation_text = aggregation.text if aggregation is not None else 'None'
+                    
+                    # Determine role based on aggregation type
+                    if aggregation_text in _MEASURE_AGGS:
+                        role = 'measure'
+                    elif aggregation_text == 'None':
+                        role = 'dimension'
+                    else:
+                        role = 'dimension'  # Default to dimension for other cases
+                    
+                    # Get parent table
+                    parent_name = children.get('parent-name')
+                    parent_table = sys.intern(str(parent_name.text).translate(BRACKET_CLEAN_TABLE)) if parent_name is not None and parent_name.text is not None else 'Unknown'
+                    
+                    # Get remote name (original database field)
+                    remote_name = children.get('remote-name')
+                    remote_field = str(remote_name.text) if remote_name is not None and remote_name.text is not None else field_name
+                    
+                    # Update field metadata with rich information (one lookup for existing entries)
+                    existing = field_metadata.get(field_name)
+                    if existing is not None:
+                        existing.update({
+                            'data_type': data_type,
+                            'role': role,
+                            'aggregation': aggregation_text,
+                            'parent_table': parent_table,
+                            'remote_name': remote_field
+                        })
+                    else:
+                        field_metadata[field_name] = {
+                            'data_type': data_type,
+                            'role': role,
+                            'aggregation': aggregation_text,
+                            'parent_table': parent_table,
+                            'remote_name': remote_field,
+                            'table_reference': parent_table,  # Just the table name
+                            'table_name': parent_table,
+                            'used_in_workbook': False
+                        }
+        
+        # Now check for field usage across the entire workbook
+        self.track_field_usage(field_metadata)
         
         return field_metadata
     
+    def extract_field_metadata_columnar(self, datasource_name):
+        """Return extract_field_metadata as a pandas DataFrame with one column per attribute."""
+        try:
+            import pandas as pd
+        except ImportError as e:
+            logger.warning("⚠️ Pandas not available: %s", e)
+            return None
+        
+        field_metadata = self.extract_field_metadata(datasource_name)
+        columns = {'name': list(field_metadata)}
+        for attribute in _COLUMNAR_FIELDS:
+            columns[attribute] = [metadata.get(attribute) for metadata in field_metadata.values()]
+        
+        table = pd.DataFrame(columns)
+        # Categoricals keep each repeated string once, like dictionary encoding
+        for attribute in _CATEGORICAL_FIELDS:
+            table[attribute] = table[attribute].astype('category')
+        return table
+    
     def track_field_usage(self, field_metadata):
         """Track which fields are actually used in the workbook using official Tableau API."""
         if not self.workbook:
             return
         
-        # Use the official Tableau API to check field usage
-        for datasource in self.workbook.datasources:
-            # According to API docs, datasource.fields returns key-value pairs
-            if hasattr(datasource, 'fields') and hasattr(datasource.fields, 'items'):
-                for field_name, field_attrs in datasource.fields.items():
-                    # Check if this field is used in any worksheets
-                    if hasattr(field_attrs, 'worksheets') and field_attrs.worksheets:
-                        # Try to match this field with our metadata
-                        # Clean the field name (remove brackets and extra info)
-                        clean_field_name = field_name.replace('[', '').replace(']', '')
-                        
-                        # Look for exact matches first
-                        if clean_field_name in field_metadata:
-                            field_metadata[clean_field_name]['used_in_workbook'] = True
-                        else:
-                            # Try partial matches (field name contains our metadata key)
-                            for metadata_key in field_metadata.keys():
-                                if metadata_key in clean_field_name or clean_field_name in metadata_key:
-                                    field_metadata[metadata_key]['used_in_workbook'] = True
-                                    break
+        # Use the official Tableau API to check field usage (collected once per workbook)
+        for clean_field_name in self._used_field_names:
+            # Look for exact matches first
+            if clean_field_name in field_metadata:
+                field_metadata[clean_field_name]['used_in_workbook'] = True
+            else:
+                # Try partial matches (field name contains our metadata key, or the other way round)
+                for metadata_key, metadata in field_metadata.items():
+                    if metadata_key in clean_field_name or clean_field_name in metadata_key:
+                        metadata['used_in_workbook'] = True
+                        break
 
     def extract_filter_details(self, filter_elem):
         """Extract detailed filter information including function, operation, and values."""
         filter_details = {}
         
         # Get the main groupfilter
-        main_groupfilter = filter_elem.find('.//groupfilter')
+        main_groupfilter = next(filter_elem.iter('groupfilter'), None)
         if main_groupfilter is not None:
+            group_attrib = main_groupfilter.attrib
+            
             # Extract filter function (union, except, etc.)
-            filter_details['function'] = main_groupfilter.get('function', '')
+            filter_details['function'] = group_attrib.get('function', '')
             
             # Extract operation details
-            filter_details['operation'] = main_groupfilter.get('user:op', '')
+            filter_details['operation'] = group_attrib.get('user:op', '')
             
             # Extract behavior (exclusive, relevant, etc.)
-            filter_details['behavior'] = main_groupfilter.get('user:ui-domain', '')
+            filter_details['behavior'] = group_attrib.get('user:ui-domain', '')
             
             # Extract filter values/members
             values = []
-            for member_filter in main_groupfilter.findall('.//groupfilter[@function="member"]'):
-                member_value = member_filter.get('member', '')
+            member_filters = main_groupfilter.iter('groupfilter')
+            next(member_filters)  # iter() yields main_groupfilter itself first
+            for member_filter in member_filters:
+                member_attrib = member_filter.attrib
+                if member_attrib.get('function') != 'member':
+                    continue
+                member_value = member_attrib.get('member', '')
                 if member_value:
                     # Clean up the member value
-                    clean_value = member_value.replace('&quot;', '"').replace('[', '').replace(']', '')
+                    clean_value = member_value.replace('&quot;', '"').translate(BRACKET_CLEAN_TABLE)
                     # Extract just the field name part if it's a complex reference
-                    if '.' in clean_value:
-                        field_part = clean_value.split('.')[-1]
-                    else:
-                        field_part = clean_value
-                    values.append(field_part)
+                    values.append(clean_value.rpartition('.')[2])
             
             filter_details['values'] = values
             
             # Create a human-readable description
-            if filter_details['function'] == 'union':
-                if values:
-                    filter_details['description'] = f"Show only: {', '.join(values)}"
-                else:
-                    filter_details['description'] = "Include specific values"
-            elif filter_details['function'] == 'except':
-                if values:
-                    filter_details['description'] = f"Exclude: {', '.join(values)}"
-                else:
-                    filter_details['description'] = "Exclude specific values"
-            elif filter_details['function'] == 'level-members':
-                filter_details['description'] = "Show all values in level"
-            else:
-                filter_details['description'] = f"{filter_details['function']} operation"
+            filter_details['description'] = self._describe_filter(filter_details['function'], values)
         
         return filter_details
+    
+    def _describe_filter(self, function, values):
+        """Build the human-readable description of a filter from its function and member values."""
+        descriptions = _FILTER_DESCRIPTIONS.get(function)
+        if descriptions is None:
+            return f"{function} operation"
+        
+        values_prefix, fallback = descriptions
+        if values_prefix and values:
+            return values_prefix + ', '.join(values)
+        return fallback
 
     def extract_dashboard_worksheet_info(self, xml_root):
         """Extract dashboard and worksheet information with field usage and chart types."""
         if not self.xml_root:
             return {}
         
-        print(f"🔍 Extracting dashboard and worksheet information...")
+        # The result covers the whole workbook, so later calls reuse the first one;
+        # callers get their own copy so edits never reach the cache
+        if self._dashboard_info is not None and self._dashboard_info_root is self.xml_root:
+            return copy.deepcopy(self._dashboard_info)
+        
+        logger.info("🔍 Extracting dashboard and worksheet information...")
         
         dashboard_info = {}
         
         # Extract worksheets
-        worksheets = self.xml_root.findall('.//worksheet')
-        print(f"   Found {len(worksheets)} worksheets")
+        worksheets = list(self.xml_root.iter('worksheet'))
+        logger.info("   Found %d worksheets", len(worksheets))
         
         for worksheet in worksheets:
             worksheet_name = worksheet.get('name', 'Unknown')
-            print(f"   Processing worksheet: {worksheet_name}")
+            logger.debug("   Processing worksheet: %s", worksheet_name)
             
             # Extract fields used in this worksheet from datasource-dependencies
             used_fields = self._extract_used_fields_from_worksheet(worksheet)
@@ -225,25 +345,24 @@ class FieldExtractor:
                 'used_fields': used_fields,
                 'filters': filters
             }
-            
-
         
         # Extract dashboards
-        dashboards = self.xml_root.findall('.//dashboard')
-        print(f"   Found {len(dashboards)} dashboards")
+        dashboards = list(self.xml_root.iter('dashboard'))
+        logger.info("   Found %d dashboards", len(dashboards))
         
         for dashboard in dashboards:
             dashboard_name = dashboard.get('name', 'Unknown')
-            print(f"   Processing dashboard: {dashboard_name}")
+            logger.debug("   Processing dashboard: %s", dashboard_name)
             
             # Get dashboard size
-            size_elem = dashboard.find('.//size')
-            width = size_elem.get('width', 'Unknown') if size_elem is not None else 'Unknown'
-            height = size_elem.get('height', 'Unknown') if size_elem is not None else 'Unknown'
+            size_elem = next(dashboard.iter('size'), None)
+            size_attrib = size_elem.attrib if size_elem is not None else {}
+            width = size_attrib.get('width', 'Unknown')
+            height = size_attrib.get('height', 'Unknown')
             
             # Extract worksheets included in this dashboard
             included_worksheets = []
-            worksheet_elements = dashboard.findall('.//worksheet')
+            worksheet_elements = dashboard.iter('worksheet')
             for ws_elem in worksheet_elements:
                 ws_name = ws_elem.get('name', '')
                 if ws_name:
@@ -251,17 +370,18 @@ class FieldExtractor:
             
             # Extract dashboard-level filters
             dashboard_filters = []
-            filter_elements = dashboard.findall('.//filter')
+            filter_elements = dashboard.iter('filter')
             for filter_elem in filter_elements:
-                filter_name = filter_elem.get('name', '')
-                filter_type = filter_elem.get('class', 'Unknown')
-                filter_field = filter_elem.get('field', '')
+                filter_attrib = filter_elem.attrib
+                filter_name = filter_attrib.get('name', '')
+                filter_type = filter_attrib.get('class', 'Unknown')
+                filter_field = filter_attrib.get('field', '')
                 
                 if filter_name:
                     dashboard_filters.append({
                         'name': filter_name,
                         'type': filter_type,
-                        'field': filter_field.replace('[', '').replace(']', '') if filter_field else ''
+                        'field': filter_field.translate(BRACKET_CLEAN_TABLE) if filter_field else ''
                     })
             
             dashboard_info[dashboard_name] = {
@@ -272,7 +392,10 @@ class FieldExtractor:
                 'filters': dashboard_filters
             }
         
-        print(f"   Total items found: {len(dashboard_info)}")
+        logger.info("   Total items found: %d", len(dashboard_info))
+        # Keep a private copy for later calls and hand the freshly built result to this caller
+        self._dashboard_info = copy.deepcopy(dashboard_info)
+        self._dashboard_info_root = self.xml_root
         return dashboard_info
 
     def _extract_used_fields_from_worksheet(self, worksheet):
@@ -280,10 +403,10 @@ class FieldExtractor:
         used_fields = []
         
         # Look for datasource-dependencies which shows actual field usage
-        deps = worksheet.findall('.//datasource-dependencies')
+        deps = worksheet.iter('datasource-dependencies')
         for dep in deps:
             # Extract column elements which show field usage like [none:corpus:nk], [sum:word_count:qk]
-            columns = dep.findall('.//column')
+            columns = dep.iter('column')
             for col in columns:
                 col_name = col.get('name', '')
                 if col_name and col_name.startswith('[') and col_name.endswith(']'):
@@ -295,11 +418,11 @@ class FieldExtractor:
         
         # Fallback: if no datasource-dependencies, try basic column extraction
         if not used_fields:
-            field_elements = worksheet.findall('.//column')
+            field_elements = worksheet.iter('column')
             for field_elem in field_elements:
                 field_name = field_elem.get('name', '')
                 if field_name:
-                    clean_name = field_name.replace('[', '').replace(']', '').split(':')[-1]
+                    clean_name = field_name.translate(BRACKET_CLEAN_TABLE).rpartition(':')[2]
                     if clean_name and clean_name not in used_fields:
                         used_fields.append(clean_name)
         
@@ -339,12 +462,12 @@ class FieldExtractor:
             return 'Pie Chart'
         
         # Check mark type if name doesn't give clear indication
-        mark_elem = worksheet.find('.//mark')
+        mark_elem = next(worksheet.iter('mark'), None)
         mark_class = mark_elem.get('class', 'Automatic') if mark_elem is not None else 'Automatic'
         
         # Extract rows and columns arrangement
-        rows_elem = worksheet.find('.//rows')
-        cols_elem = worksheet.find('.//cols')
+        rows_elem = next(worksheet.iter('rows'), None)
+        cols_elem = next(worksheet.iter('cols'), None)
         
         rows_text = rows_elem.text if rows_elem is not None and rows_elem.text else ''
         cols_text = cols_elem.text if cols_elem is not None and cols_elem.text else ''
@@ -386,20 +509,18 @@ class FieldExtractor:
         filters = []
         
         # Find all filter elements in the worksheet
-        filter_elements = worksheet.findall('.//filter')
+        filter_elements = worksheet.iter('filter')
         for filter_elem in filter_elements:
-            filter_name = filter_elem.get('name', '')
-            filter_type = filter_elem.get('class', 'Unknown')
-            filter_field = filter_elem.get('column', '')
+            filter_attrib = filter_elem.attrib
+            filter_name = filter_attrib.get('name', '')
+            filter_type = filter_attrib.get('class', 'Unknown')
+            filter_field = filter_attrib.get('column', '')
             
             if filter_field:
                 # Clean up the filter field name
-                clean_filter_field = filter_field.replace('[', '').replace(']', '')
+                clean_filter_field = filter_field.translate(BRACKET_CLEAN_TABLE)
                 # Extract just the field name part (after the last dot)
-                if '.' in clean_filter_field:
-                    field_part = clean_filter_field.split('.')[-1]
-                else:
-                    field_part = clean_filter_field
+                field_part = clean_filter_field.rpartition('.')[2]
                 
                 # Use the existing extract_filter_details method
                 filter_details = self.extract_filter_details(filter_elem)
@@ -422,22 +543,27 @@ class FieldExtractor:
         if not self.xml_root:
             return
         
-        print(f"🔍 Looking for calculated fields and parameters in workbook XML...")
+        logger.info("🔍 Looking for calculated fields and parameters in workbook XML...")
         
         # Use the official Tableau API to properly distinguish between calculated fields and parameters
         if not self.workbook:
-            print("   Warning: No workbook object available, falling back to XML parsing")
+            logger.warning("   Warning: No workbook object available, falling back to XML parsing")
             return
         
         # Process each datasource in the workbook
         for datasource in self.workbook.datasources:
-            print(f"   Processing datasource: {datasource.name}")
+            logger.info("   Processing datasource: %s", datasource.name)
             
             # Get all fields from this datasource using the official API
             if hasattr(datasource, 'fields'):
                 for field_name, field_obj in datasource.fields.items():
+                    # Only calculated fields and parameters are recorded below; skip plain columns early
+                    if (field_name not in self._calculated_column_names and
+                            field_name not in self._parameter_columns_by_name):
+                        continue
+                    
                     # Clean the field name (remove brackets)
-                    clean_name = field_name.replace('[', '').replace(']', '')
+                    clean_name = field_name.translate(BRACKET_CLEAN_TABLE)
                     
                     # Get the caption (display name) - this is what users see in Tableau
                     caption = getattr(field_obj, 'caption', clean_name)
@@ -447,111 +573,47 @@ class FieldExtractor:
                     # Clean the caption to remove numbers at the beginning
                     clean_caption = self.clean_field_name(caption)
                     
-                    print(f"     Processing field: {clean_name} -> {clean_caption}")
-                    print(f"       Caption: {caption}")
+                    logger.debug("     Processing field: %s -> %s", clean_name, clean_caption)
+                    logger.debug("       Caption: %s", caption)
                     
                     # Check if this is a calculated field using the official API
                     if hasattr(field_obj, 'calculation') and field_obj.calculation:
-                        print(f"       Type: Calculated Field")
-                        print(f"       Formula: {field_obj.calculation[:50]}{'...' if len(field_obj.calculation) > 50 else ''}")
+                        logger.debug("       Type: Calculated Field")
+                        logger.debug("       Formula: %.50s%s", field_obj.calculation, '...' if len(field_obj.calculation) > 50 else '')
                         
                         # Create or update calculated field entry
-                        if clean_caption in field_metadata:
-                            field_metadata[clean_caption].update({
-                                'is_calculated': True,
-                                'is_parameter': False,
-                                'calculation_formula': field_obj.calculation,
-                                'calculation_class': 'tableau',
-                                'datatype': getattr(field_obj, 'datatype', 'Unknown'),
-                                'role': getattr(field_obj, 'role', 'Unknown'),
-                                'type': getattr(field_obj, 'type', 'Unknown'),
-                                'used_in_workbook': True
-                            })
-                        else:
-                            field_metadata[clean_caption] = {
-                                'name': clean_caption,
-                                'caption': caption,
-                                'datatype': getattr(field_obj, 'datatype', 'Unknown'),
-                                'role': getattr(field_obj, 'role', 'Unknown'),
-                                'type': getattr(field_obj, 'type', 'Unknown'),
-                                'is_calculated': True,
-                                'is_parameter': False,
-                                'field_type': 'Calculated',
-                                'calculation_formula': field_obj.calculation,
-                                'calculation_class': 'tableau',
-                                'table_reference': None,
-                                'remote_name': None,
-                                'used_in_workbook': True,
-                                'data_type': getattr(field_obj, 'datatype', 'Unknown'),
-                                'parent_table': 'Workbook',
-                                'table_name': 'Workbook'
-                            }
+                        self._record_workbook_field(field_metadata, clean_caption, caption, field_obj, field_obj.calculation, is_parameter=False)
                     
                     # Check if this is a parameter field
                     # Parameters in Tableau have specific attributes in the XML
                     elif hasattr(field_obj, 'xml') and field_obj.xml is not None:
                         # Check if the XML element has param-domain-type attribute (indicates parameter)
                         if field_obj.xml.get('param-domain-type') is not None:
-                            print(f"       Type: Parameter")
+                            logger.debug("       Type: Parameter")
                             
                             # Get formula if available
                             formula = ''
                             if hasattr(field_obj, 'calculation') and field_obj.calculation:
                                 formula = field_obj.calculation
-                                print(f"       Formula: {formula[:50]}{'...' if len(formula) > 50 else ''}")
+                                logger.debug("       Formula: %.50s%s", formula, '...' if len(formula) > 50 else '')
                             
-                            # Create or update parameter field entry
-                            if clean_caption in field_metadata:
-                                field_metadata[clean_caption].update({
-                                    'is_calculated': False,
-                                    'is_parameter': True,
-                                    'calculation_formula': formula,
-                                    'calculation_class': 'tableau',
-                                    'datatype': getattr(field_obj, 'datatype', 'Unknown'),
-                                    'role': getattr(field_obj, 'role', 'Unknown'),
-                                    'type': getattr(field_obj, 'type', 'Unknown'),
-                                    'used_in_workbook': True
-                                })
-                            else:
-                                field_metadata[clean_caption] = {
-                                    'name': clean_caption,
-                                    'caption': caption,
-                                    'datatype': getattr(field_obj, 'datatype', 'Unknown'),
-                                    'role': getattr(field_obj, 'role', 'Unknown'),
-                                    'type': getattr(field_obj, 'type', 'Unknown'),
-                                    'is_calculated': False,
-                                    'is_parameter': True,
-                                    'field_type': 'Parameter',
-                                    'calculation_formula': formula,
-                                    'calculation_class': 'tableau',
-                                    'table_reference': None,
-                                    'remote_name': None,
-                                    'used_in_workbook': True,
-                                    'data_type': getattr(field_obj, 'datatype', 'Unknown'),
-                                    'parent_table': 'Workbook',
-                                    'table_name': 'Workbook'
-                                }
+                            # Create or update parameter entry
+                            self._record_workbook_field(field_metadata, clean_caption, caption, field_obj, formula, is_parameter=True)
                         else:
-                            print(f"       Type: Regular Field")
+                            logger.debug("       Type: Regular Field")
                     
                     # FALLBACK: If the official API didn't detect parameters, check XML directly
                     # This is needed because some Tableau versions don't expose param-domain-type properly
                     if not field_metadata.get(clean_caption, {}).get('is_parameter', False):
                         # Check if this field name matches a parameter pattern in the XML
                         if self.xml_root:
-                            # Look for columns with param-domain-type attribute
-                            # Use a simpler approach to avoid XPath syntax issues with brackets
-                            param_elements = []
-                            for col in self.xml_root.findall('.//column[@param-domain-type]'):
-                                if col.get('name') == field_name:
-                                    param_elements.append(col)
-                                    break
+                            # Look for columns with param-domain-type attribute (indexed by name once)
+                            param_elem = self._parameter_columns_by_name.get(field_name)
                             
-                            if param_elements:
-                                print(f"       Type: Parameter (detected via XML fallback)")
+                            if param_elem is not None:
+                                logger.debug("       Type: Parameter (detected via XML fallback)")
                                 
                                 # Get the parameter element
-                                param_elem = param_elements[0]
                                 param_type = param_elem.get('param-domain-type', 'Unknown')
                                 param_value = param_elem.get('value', '')
                                 
@@ -559,75 +621,87 @@ class FieldExtractor:
                                 if not param_value and hasattr(field_obj, 'calculation') and field_obj.calculation:
                                     param_value = field_obj.calculation
                                 
-                                # Create or update parameter field entry
-                                if clean_caption in field_metadata:
-                                    field_metadata[clean_caption].update({
-                                        'is_calculated': False,
-                                        'is_parameter': True,
-                                        'calculation_formula': param_value,
-                                        'calculation_class': 'tableau',
-                                        'datatype': getattr(field_obj, 'datatype', 'Unknown'),
-                                        'role': getattr(field_obj, 'role', 'Unknown'),
-                                        'type': getattr(field_obj, 'type', 'Unknown'),
-                                        'used_in_workbook': True
-                                    })
-                                else:
-                                    field_metadata[clean_caption] = {
-                                        'name': clean_caption,
-                                        'caption': caption,
-                                        'datatype': getattr(field_obj, 'datatype', 'Unknown'),
-                                        'role': getattr(field_obj, 'role', 'Unknown'),
-                                        'type': getattr(field_obj, 'type', 'Unknown'),
-                                        'is_calculated': False,
-                                        'is_parameter': True,
-                                        'field_type': 'Parameter',
-                                        'calculation_formula': param_value,
-                                        'calculation_class': 'tableau',
-                                        'table_reference': None,
-                                        'remote_name': None,
-                                        'used_in_workbook': True,
-                                        'data_type': getattr(field_obj, 'datatype', 'Unknown'),
-                                        'parent_table': 'Workbook',
-                                        'table_name': 'Workbook'
-                                    }
-        
-        # Count calculated fields and parameters
-        calc_count = sum(1 for field in field_metadata.values() if field.get('is_calculated', False))
-        param_count = sum(1 for field in field_metadata.values() if field.get('is_parameter', False))
-        print(f"   Total calculated fields in metadata: {calc_count}")
-        print(f"   Total parameters in metadata: {param_count}")
-        
-        # Debug: Show some field names in metadata
-        print(f"   Sample fields in metadata: {list(field_metadata.keys())[:5]}")
-        if calc_count > 0:
-            print(f"   Calculated field names: {[k for k, v in field_metadata.items() if v.get('is_calculated', False)]}")
-        if param_count > 0:
-            print(f"   Parameter names: {[k for k, v in field_metadata.items() if v.get('is_parameter', False)]}")
+                                # Create or update parameter entry
+                                self._record_workbook_field(field_metadata, clean_caption, caption, field_obj, param_value, is_parameter=True)
+        
+        # Count calculated fields and parameters in one pass
+        calc_count = param_count = 0
+        for field in field_metadata.values():
+            if field.get('is_calculated', False):
+                calc_count += 1
+            if field.get('is_parameter', False):
+                param_count += 1
+        logger.info("   Total calculated fields in metadata: %d", calc_count)
+        logger.info("   Total parameters in metadata: %d", param_count)
+        
+        # Debug: Show some field names in metadata (the name lists are only built when shown)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("   Sample fields in metadata: %s", list(field_metadata)[:5])
+            if calc_count > 0:
+                logger.debug("   Calculated field names: %s", [k for k, v in field_metadata.items() if v.get('is_calculated', False)])
+            if param_count > 0:
+                logger.debug("   Parameter names: %s", [k for k, v in field_metadata.items() if v.get('is_parameter', False)])
         
         # Now resolve any calculation references to use friendly names
         self.resolve_calculation_references(field_metadata)
 
+    def _record_workbook_field(self, field_metadata, clean_caption, caption, field_obj, formula, is_parameter):
+        """Create or update the metadata entry for a calculated field or parameter."""
+        # Document API values shared by the update and create paths
+        api_values = {
+            'datatype': getattr(field_obj, 'datatype', 'Unknown'),
+            'role': getattr(field_obj, 'role', 'Unknown'),
+            'type': getattr(field_obj, 'type', 'Unknown')
+        }
+        
+        existing = field_metadata.get(clean_caption)
+        if existing is not None:
+            existing.update({
+                'is_calculated': not is_parameter,
+                'is_parameter': is_parameter,
+                'calculation_formula': formula,
+                'calculation_class': 'tableau',
+                **api_values,
+                'used_in_workbook': True
+            })
+        else:
+            field_metadata[clean_caption] = {
+                'name': clean_caption,
+                'caption': caption,
+                **api_values,
+                'is_calculated': not is_parameter,
+                'is_parameter': is_parameter,
+                'field_type': 'Parameter' if is_parameter else 'Calculated',
+                'calculation_formula': formula,
+                'calculation_class': 'tableau',
+                'table_reference': None,
+                'remote_name': None,
+                'used_in_workbook': True,
+                'data_type': api_values['datatype'],
+                'parent_table': 'Workbook',
+                'table_name': 'Workbook'
+            }
+
     def resolve_calculation_references(self, field_metadata):
         """Replace internal calculation IDs with friendly field names in formulas."""
-        import re
-        
-        print("🔧 Resolving calculation references...")
+        logger.info("🔧 Resolving calculation references...")
         
         # FIRST PASS: Build a complete mapping from calculation IDs to friendly names
         calc_id_to_name = {}
         
         if self.xml_root:
             # Find all columns with calculations and build the mapping
-            calculated_columns = self.xml_root.findall('.//column[calculation]')
-            print(f"   Found {len(calculated_columns)} calculated columns in XML")
+            calculated_columns = self._calculated_columns
+            logger.info("   Found %d calculated columns in XML", len(calculated_columns))
             
             for column in calculated_columns:
-                column_name = column.get('name', '').replace('[', '').replace(']', '')
-                caption = column.get('caption', column_name)
+                column_attrib = column.attrib
+                column_name = column_attrib.get('name', '').translate(BRACKET_CLEAN_TABLE)
+                caption = column_attrib.get('caption', column_name)
                 
                 # Map the calculation ID to its friendly name
                 calc_id_to_name[column_name] = caption
-                print(f"   Mapped calculation ID: {column_name} -> {caption}")
+                logger.debug("   Mapped calculation ID: %s -> %s", column_name, caption)
         
         # Also check our field metadata for any calculated fields we might have missed
         for field_name, field_info in field_metadata.items():
@@ -635,45 +709,96 @@ class FieldExtractor:
                 # If this field has a calculation ID pattern, map it to its friendly name
                 if 'Calculation_' in field_name:
                     calc_id_to_name[field_name] = field_info.get('name', field_name)
-                    print(f"   Mapped from metadata: {field_name} -> {field_info.get('name', field_name)}")
+                    logger.debug("   Mapped from metadata: %s -> %s", field_name, calc_id_to_name[field_name])
+        
+        logger.info("   Total calculation mappings: %d", len(calc_id_to_name))
         
-        print(f"   Total calculation mappings: {len(calc_id_to_name)}")
+        # Nothing to resolve without mappings
+        if not calc_id_to_name:
+            logger.info("   Total calculation references resolved: %d", 0)
+            return
+        
+        # Only calculated fields whose formula holds a bracketed reference can change
+        referencing_fields = [
+            (field_name, field_info) for field_name, field_info in field_metadata.items()
+            if field_info.get('is_calculated', False) and '[' in (field_info.get('calculation_formula', '') or '')
+        ]
+        
+        # Bracketed friendly names, cleaned on first use and shared across formulas
+        replacements = {}
+        
+        def replacement_for(calc_id):
+            replacement = replacements.get(calc_id)
+            if replacement is None:
+                # Clean the friendly name to remove numbers at the beginning
+                replacement = replacements[calc_id] = f'[{self.clean_field_name(calc_id_to_name[calc_id])}]'
+            return replacement
+        
+        # Whether a friendly name itself contains a known reference, which then gets resolved again
+        chains = {}
+        
+        def is_chained(calc_id):
+            chained = chains.get(calc_id)
+            if chained is None:
+                chained = chains[calc_id] = any(
+                    reference in calc_id_to_name
+                    for reference in _BRACKETED_REFERENCE.findall(replacement_for(calc_id))
+                )
+            return chained
         
         # SECOND PASS: Replace calculation references in all formulas
         replaced_count = 0
-        for field_name, field_info in field_metadata.items():
-            if field_info.get('is_calculated', False):
-                formula = field_info.get('calculation_formula', '')
-                original_formula = formula
-                
-                # Replace all known calculation IDs with friendly names
-                for calc_id, friendly_name in calc_id_to_name.items():
-                    if f'[{calc_id}]' in formula:
-                        # Clean the friendly name to remove numbers at the beginning
-                        clean_friendly_name = self.clean_field_name(friendly_name)
-                        formula = formula.replace(f'[{calc_id}]', f'[{clean_friendly_name}]')
-                        print(f"   In '{field_name}': Replaced [{calc_id}] with [{clean_friendly_name}]")
-                        replaced_count += 1
-                
-                # Also handle any remaining Calculation_XXXXXXXX patterns
-                calc_pattern = re.compile(r'\[Calculation_(\d+)\]')
-                matches = calc_pattern.findall(formula)
-                
-                for calc_num in matches:
-                    calc_ref = f'Calculation_{calc_num}'
-                    # Try to find a friendly name for this calculation ID
-                    if calc_ref in calc_id_to_name:
-                        # Clean the friendly name to remove numbers at the beginning
-                        clean_friendly_name = self.clean_field_name(calc_id_to_name[calc_ref])
-                        formula = formula.replace(f'[{calc_ref}]', f'[{clean_friendly_name}]')
-                        print(f"   In '{field_name}': Replaced [{calc_ref}] with [{clean_friendly_name}]")
-                        replaced_count += 1
-                
-                # Update the formula if it changed
-                if formula != original_formula:
-                    field_info['calculation_formula'] = formula
+        for field_name, field_info in referencing_fields:
+            formula = field_info['calculation_formula']
+            
+            # Bracketed references cannot overlap, so one substitution pass resolves them all
+            resolved_ids = [
+                calc_id for calc_id in dict.fromkeys(_BRACKETED_REFERENCE.findall(formula))
+                if calc_id in calc_id_to_name
+            ]
+            if not resolved_ids:
+                continue
+            
+            # A friendly name that is itself a reference is resolved in mapping order, one ID at a time
+            if any(is_chained(calc_id) for calc_id in resolved_ids):
+                formula, count = self._resolve_references_sequentially(
+                    field_name, formula, calc_id_to_name, replacement_for
+                )
+                field_info['calculation_formula'] = formula
+                replaced_count += count
+                continue
+            
+            for calc_id in resolved_ids:
+                logger.debug("   In '%s': Replaced [%s] with %s", field_name, calc_id, replacement_for(calc_id))
+            replaced_count += len(resolved_ids)
+            
+            field_info['calculation_formula'] = _BRACKETED_REFERENCE.sub(
+                lambda match: replacements.get(match.group(1), match.group(0)), formula
+            )
+        
+        logger.info("   Total calculation references resolved: %d", replaced_count)
+    
+    def _resolve_references_sequentially(self, field_name, formula, calc_id_to_name, replacement_for):
+        """Replace each known calculation ID in mapping order, then any remaining [Calculation_N] references."""
+        replaced_count = 0
         
-        print(f"   Total calculation references resolved: {replaced_count}")
+        # Replace all known calculation IDs with friendly names
+        for calc_id in calc_id_to_name:
+            reference = f'[{calc_id}]'
+            if reference in formula:
+                formula = formula.replace(reference, replacement_for(calc_id))
+                logger.debug("   In '%s': Replaced %s with %s", field_name, reference, replacement_for(calc_id))
+                replaced_count += 1
+        
+        # Also handle any remaining Calculation_XXXXXXXX patterns
+        for calc_num in _CALCULATION_REFERENCE.findall(formula):
+            calc_ref = f'Calculation_{calc_num}'
+            if calc_ref in calc_id_to_name:
+                formula = formula.replace(f'[{calc_ref}]', replacement_for(calc_ref))
+                logger.debug("   In '%s': Replaced [%s] with %s", field_name, calc_ref, replacement_for(calc_ref))
+                replaced_count += 1
+        
+        return formula, replaced_count
 
     def extract_data_from_hyper_files(self, twbx_path):
         """Extract actual data from any .hyper files found in the TWBX."""
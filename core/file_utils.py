@@ -5,6 +5,19 @@ Handles file operations and validation
 """
 
 import os
+import re
+import functools
+
+
+# Spaces and slashes become underscores before dropping other unsafe characters
+_SAFE_NAME_TABLE = str.maketrans({' ': '_', '/': '_'})
+# Anything that is not alphanumeric, '_' or '-' (\w follows str.isalnum for Unicode)
+_UNSAFE_NAME_CHARS = re.compile(r'[^\w-]')
+
+# Square brackets around Tableau table and field references
+BRACKET_CLEAN_TABLE = str.maketrans({'[': None, ']': None})
+# Bracket and backtick quoting around (BigQuery) table names
+QUOTED_NAME_CLEAN_TABLE = str.maketrans({'[': None, ']': None, '`': None})
 
 
 def find_tableau_files(directory='.'):
@@ -18,13 +31,12 @@ def find_twbx_files(directory='.'):
     return twbx_files
 
 
+@functools.lru_cache(maxsize=128)
 def create_safe_filename(name):
     """Create a safe filename by removing/replacing unsafe characters."""
-    # Replace spaces and slashes with underscores
-    safe_name = name.replace(' ', '_').replace('/', '_')
-    # Keep only alphanumeric characters, underscores, and hyphens
-    safe_name = ''.join(c for c in safe_name if c.isalnum() or c in '_-')
-    return safe_name
+    # Replace spaces and slashes with underscores, then keep only
+    # alphanumeric characters, underscores, and hyphens
+    return _UNSAFE_NAME_CHARS.sub('', name.translate(_SAFE_NAME_TABLE))
 
 
 def ensure_directory_exists(directory):
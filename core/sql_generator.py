@@ -6,6 +6,7 @@ Handles SQL extraction and relationship mapping from Tableau XML
 
 import xml.etree.ElementTree as ET
 import re
+from .file_utils import BRACKET_CLEAN_TABLE
 
 
 class SQLGenerator:
@@ -41,7 +42,7 @@ class SQLGenerator:
             
             if table_name:
                 # Clean up table name - remove [public]. prefix
-                clean_table = table_name.replace('[public].', '').replace('[', '').replace(']', '')
+                clean_table = table_name.replace('[public].', '').translate(BRACKET_CLEAN_TABLE)
                 
                 sql_info['table_references'].append({
                     'table': clean_table,
@@ -90,7 +91,7 @@ class SQLGenerator:
                 
                 # Extract tables involved in this join
                 for table_rel in relation.findall('.//relation[@table]'):
-                    table_name = table_rel.get('table', '').replace('[public].', '').replace('[', '').replace(']', '')
+                    table_name = table_rel.get('table', '').replace('[public].', '').translate(BRACKET_CLEAN_TABLE)
                     table_alias = table_rel.get('name', '')
                     if table_name and table_alias:
                         sql_info['relationships'][-1]['tables'].append({
@@ -120,7 +121,7 @@ class SQLGenerator:
     def clean_join_condition(self, join_condition):
         """Clean join condition for universal database compatibility."""
         # Remove brackets from field references
-        clean_condition = join_condition.replace('[', '').replace(']', '')
+        clean_condition = join_condition.translate(BRACKET_CLEAN_TABLE)
         
         # Replace spaces with underscores in field names
         clean_condition = clean_condition.replace(' ', '_')
@@ -130,7 +131,7 @@ class SQLGenerator:
     def clean_table_name(self, table_name):
         """Clean table name for universal database compatibility."""
         # Remove brackets
-        clean_name = table_name.replace('[', '').replace(']', '')
+        clean_name = table_name.translate(BRACKET_CLEAN_TABLE)
         
         # Replace spaces with underscores
         clean_name = clean_name.replace(' ', '_')
@@ -144,7 +145,7 @@ class SQLGenerator:
         clean_ref = re.sub(r'\[([^\]]*)\]', lambda m: '[' + m.group(1).replace(' ', '_') + ']', field_ref)
         
         # Second: remove brackets
-        clean_ref = clean_ref.replace('[', '').replace(']', '')
+        clean_ref = clean_ref.translate(BRACKET_CLEAN_TABLE)
         
         return clean_ref
     
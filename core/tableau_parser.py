@@ -17,6 +17,8 @@ class TableauParser:
         self.twbx_path = twbx_path
         self.workbook = None
         self.xml_root = None
+        # Datasource name -> element, built on the first lookup
+        self._datasources_by_name = None
     
     def extract_and_parse(self):
         """Extract TWBX/TWB and parse using official Tableau API + XML."""
@@ -25,6 +27,7 @@ class TableauParser:
             self.workbook = Workbook(self.twbx_path)
             
             # Also extract XML for rich metadata
+            self._datasources_by_name = None
             if self.twbx_path.lower().endswith('.twbx'):
                 # TWBX file - extract XML from zip
                 with zipfile.ZipFile(self.twbx_path, 'r') as z:
@@ -59,7 +62,9 @@ class TableauParser:
         if not self.xml_root:
             return None
         
-        for datasource in self.xml_root.findall('.//datasource'):
-            if datasource.get('name') == datasource_name:
-                return datasource
-        return None
+        # Index the datasources once; callers look up every datasource by name
+        if self._datasources_by_name is None:
+            self._datasources_by_name = {}
+            for datasource in self.xml_root.iter('datasource'):
+                self._datasources_by_name.setdefault(datasource.get('name'), datasource)
+        return self._datasources_by_name.get(datasource_name)
@@ -13,6 +13,7 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
 import threading
+import logging
 from pathlib import Path
 import sys
 import subprocess
@@ -478,6 +479,9 @@ class ImprovedTableauConverterGUI:
 
 def main():
     """Main entry point for the improved GUI."""
+    # Show migrator progress messages on the console
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+    
     root = tk.Tk()
     
     # Set theme if available
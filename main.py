@@ -5,12 +5,14 @@ Coordinates all modules for TWBX processing and migration
 """
 
 import os
+import sys
+import logging
 from core.tableau_parser import TableauParser
 from core.field_extractor import FieldExtractor
 from core.sql_generator import SQLGenerator
 from core.csv_exporter import CSVExporter
 from core.thumbnail_extractor import ThumbnailExtractor
-from core.file_utils import find_tableau_files, find_twbx_files, create_safe_filename, ensure_directory_exists, validate_tableau_file, validate_twbx_file
+from core.file_utils import find_tableau_files, find_twbx_files, create_safe_filename, ensure_directory_exists, validate_tableau_file, validate_twbx_file, QUOTED_NAME_CLEAN_TABLE
 
 
 class TableauMigrator:
@@ -387,7 +389,7 @@ class TableauMigrator:
                                 # Format the table name properly for BigQuery
                                 if billing_project and dataset:
                                     # Clean the table name - remove any existing brackets or backticks
-                                    clean_table = table_name.replace('[', '').replace(']', '').replace('`', '')
+                                    clean_table = table_name.translate(QUOTED_NAME_CLEAN_TABLE)
                                     # Extract just the table name part if it's in format like publicdata.samples.shakespeare
                                     if '.' in clean_table:
                                         table_parts = clean_table.split('.')
@@ -569,6 +571,7 @@ class TableauMigrator:
 
 def main():
     """Main entry point for the Tableau to Power BI converter."""
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
     print("🔍 Tableau to Power BI Converter - Modular Edition")
     print("=" * 70)
     
@@ -0,0 +1,29 @@
+"""Tests for batch processing in EnhancedTableauMigrator."""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'core')]
+
+from core.enhanced_migrator import EnhancedTableauMigrator, _group_by_output_folder
+
+
+class RecordingMigrator(EnhancedTableauMigrator):
+    """Migrator that records which process handled each file instead of migrating it."""
+
+    def process_tableau_file_comprehensive(self, tableau_path, output_format="all"):
+        return (tableau_path, os.getpid())
+
+
+def test_same_stem_inputs_share_a_group():
+    paths = ['a/Sales.twbx', 'Other.twb', 'b/Sales.twbx', 'Sales Report.twb', 'Sales_Report.twbx']
+    assert _group_by_output_folder(paths) == [[0, 2], [1], [3, 4]]
+
+
+def test_process_many_runs_same_stem_inputs_in_one_worker():
+    paths = ['a/Sales.twbx', 'Other.twb', 'b/Sales.twbx']
+    results = RecordingMigrator.process_many(paths)
+
+    assert [path for path, _ in results] == paths
+    assert results[0][1] == results[2][1]